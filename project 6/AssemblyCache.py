@@ -0,0 +1,248 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import typing
+from array import array
+from Parser import Parser
+from SymbolTable import SymbolTable
+
+
+class AssemblyCache:
+    """An on-disk cache of assembled programs, for reassembling files that
+    change little between builds.
+    Every input file has an entry in the cache directory, holding a hash of
+    its content, its assembled instructions and its symbols. If the content
+    did not change, the cached instructions are used as they are. Otherwise,
+    the file is split into blocks, and only blocks that were not in the
+    previous version are parsed again. The instructions of the other blocks
+    are reused, and only their references to symbols whose address moved are
+    patched.
+    """
+
+    # bumped whenever the format of the entries changes
+    version = 2
+
+    # blocks start at lines that define a label, so an edit only changes the
+    # blocks around it
+    label_pattern = re.compile(r"^[^\S\n]*\(", re.MULTILINE)
+
+    # longer stretches without labels are cut into blocks of about this many
+    # characters
+    block_size = 1 << 12
+
+    def __init__(self, directory: str) -> None:
+        """Opens the cache in the given directory, creating it if needed.
+
+        Args:
+            directory (str): the cache directory.
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def assemble(self, input_path: str) -> typing.Tuple[array, SymbolTable]:
+        """Assembles a file, reusing whatever the cache holds for it, and
+        updates the cache.
+
+        Args:
+            input_path (str): the path of the .asm file.
+
+        Returns:
+            typing.Tuple[array, SymbolTable]: the instructions, and a symbol
+            table holding the labels and variables of the program.
+        """
+        with open(input_path, 'r') as input_file:
+            text = input_file.read()
+        content_hash = AssemblyCache.hash(text)
+        entry_path = os.path.join(
+            self.directory, AssemblyCache.hash(os.path.abspath(input_path)) + ".json")
+        entry = self.load(entry_path)
+        if entry is not None and entry["hash"] == content_hash:
+            # exact hit, nothing to assemble
+            words = array("H")
+            for block in entry["blocks"]:
+                words.extend(block["words"])
+            symbol_table = SymbolTable()
+            for name, address, kind in entry["symbols"]:
+                symbol_table.add_entry(name, address, kind)
+            return words, symbol_table
+
+        old_blocks = dict()
+        old_addresses = dict()
+        if entry is not None:
+            old_blocks = {block["hash"]: block for block in entry["blocks"]}
+            old_addresses = {name: address for name, address, kind in entry["symbols"]}
+
+        # the blocks of the new version: reused ones, and parsed ones
+        blocks = []
+        reused = []
+        line = 0
+        for block_text in AssemblyCache.split(text):
+            block_hash = AssemblyCache.hash(block_text)
+            block = old_blocks.get(block_hash)
+            reused.append(block is not None)
+            if block is None:
+                block = AssemblyCache.parse_block(block_text, block_hash, line)
+            blocks.append(block)
+            line += block_text.count("\n")
+
+        # resolving the symbols of the whole program. Symbols are interned in
+        # order of first appearance, like in assemble_file, so the .sym file
+        # is the same with and without the cache. A label is defined before
+        # the instruction at its offset
+        symbol_table = SymbolTable()
+        for block in blocks:
+            appearances = [(offset, 0, label) for label, offset in block["labels"]]
+            appearances.extend((offsets[0], 1, symbol)
+                               for symbol, offsets in block["refs"].items())
+            # the sort is stable, so labels at the same offset keep their order
+            appearances.sort(key=lambda appearance: appearance[:2])
+            for offset, is_ref, symbol in appearances:
+                symbol_table.intern(symbol)
+        base = 0
+        for block in blocks:
+            for label, offset in block["labels"]:
+                symbol_table.add_entry(label, base + offset)
+            base += len(block["words"])
+        n = 16
+        for block in blocks:
+            for symbol in block["refs"]:
+                if symbol_table.get_address(symbol) is None:
+                    symbol_table.add_entry(symbol, n, SymbolTable.VARIABLE)
+                    n += 1
+        moved = {name for name, address, kind in
+                 zip(symbol_table.names, symbol_table.addresses, symbol_table.kinds)
+                 if kind != SymbolTable.PREDEFINED and old_addresses.get(name) != address}
+
+        # the reused instructions hold the old addresses of their symbols, so
+        # only references to symbols that moved are patched
+        words = array("H")
+        for block, is_reused in zip(blocks, reused):
+            base = len(words)
+            words.extend(block["words"])
+            refs = block["refs"]
+            symbols = moved.intersection(refs) if is_reused is True else refs
+            for symbol in symbols:
+                address = symbol_table.get_address(symbol)
+                for offset in refs[symbol]:
+                    words[base + offset] = address
+        symbol_rows = [
+            [name, address, kind] for name, address, kind in
+            zip(symbol_table.names, symbol_table.addresses, symbol_table.kinds)
+            if kind != SymbolTable.PREDEFINED]
+        base = 0
+        for block in blocks:
+            size = len(block["words"])
+            block["words"] = words[base:base + size].tolist()
+            base += size
+        self.store(entry_path, {"version": AssemblyCache.version, "hash": content_hash,
+                                "blocks": blocks, "symbols": symbol_rows})
+        return words, symbol_table
+
+    @staticmethod
+    def parse_block(text: str, block_hash: str, line: int) -> typing.Dict:
+        """Assembles a block on its own, leaving its symbols unresolved.
+
+        Args:
+            text (str): the lines of the block.
+            block_hash (str): the hash of text.
+            line (int): the number of lines before the block in the file.
+
+        Returns:
+            typing.Dict: the block: its hash, its instructions, the offsets
+            of the instructions that refer to each symbol (in order of first
+            appearance) and the offsets of the labels it defines.
+        """
+        parser = Parser(io.StringIO(text))
+        parser.current_line = line
+        words = []
+        refs = dict()
+        labels = []
+        for kind, word, symbol, address, line in parser.instructions():
+            if symbol is None:
+                words.append(word)
+            elif kind == "A_COMMAND":
+                refs.setdefault(symbol, []).append(address)
+                words.append(0)
+            else:
+                labels.append([symbol, address])
+        return {"hash": block_hash, "words": words, "refs": refs, "labels": labels}
+
+    @staticmethod
+    def split(text: str) -> typing.Iterator[str]:
+        """Splits the text of a program into blocks of whole lines. The blocks
+        only depend on the text around them, so an edit leaves the blocks
+        before and after it the same.
+
+        Args:
+            text (str): the program.
+
+        Returns:
+            typing.Iterator[str]: the blocks, in order.
+        """
+        starts = [match.start() for match in AssemblyCache.label_pattern.finditer(text)]
+        starts.append(len(text))
+        start = 0
+        for label_start in starts:
+            while label_start - start > AssemblyCache.block_size:
+                end = text.find("\n", start + AssemblyCache.block_size) + 1
+                if end == 0 or end >= label_start:
+                    break
+                yield text[start:end]
+                start = end
+            if label_start > start:
+                yield text[start:label_start]
+                start = label_start
+
+    @staticmethod
+    def hash(text: str) -> str:
+        """
+        Args:
+            text (str): some text.
+
+        Returns:
+            str: a hash of the text.
+        """
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    @staticmethod
+    def load(entry_path: str) -> typing.Optional[typing.Dict]:
+        """
+        Args:
+            entry_path (str): the path of a cache entry.
+
+        Returns:
+            typing.Optional[typing.Dict]: the entry, None if there is no valid
+            entry at entry_path.
+        """
+        try:
+            with open(entry_path, 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != AssemblyCache.version:
+            return None
+        return entry
+
+    @staticmethod
+    def store(entry_path: str, entry: typing.Dict) -> None:
+        """Writes a cache entry. The entry is written to a temporary file
+        first, so a reader never sees it half written.
+
+        Args:
+            entry_path (str): the path of the cache entry.
+            entry (typing.Dict): the entry.
+        """
+        temp_path = entry_path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, 'w') as entry_file:
+            # dumps, unlike dump, goes through the C encoder
+            entry_file.write(json.dumps(entry, separators=(",", ":")))
+        os.replace(temp_path, entry_path)
@@ -0,0 +1,242 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import itertools
+import sys
+import typing
+from Emulator import Emulator
+
+try:
+    import numpy as np
+except ImportError:
+    # numpy is only needed to run programs in batches
+    np = None
+
+
+class BatchEmulator:
+    """Runs one Hack program on many machines at once, each with its own
+    registers and RAM, like running the same program on different inputs.
+
+    The state of the machines, or lanes, is kept in NumPy arrays: A, D and
+    the PC are vectors with an entry per lane, and RAM is a matrix with a row
+    per lane. Registers and RAM hold unsigned 16-bit words, so the
+    computations of Emulator.comp_expression can be applied to whole vectors;
+    view them as numpy.int16 to read signed values. Every step runs one
+    instruction on every lane that did not halt. Lanes that took different
+    branches are grouped by their PC, and every group runs its instruction
+    on all of its lanes together.
+
+    A lane faults when it reads or writes M while A is not a RAM address,
+    where Emulator.run raises an error. It stops before that instruction,
+    with the state Emulator leaves, and the other lanes go on.
+    """
+
+    def __init__(self, rom: typing.Sequence[int], lanes: int) -> None:
+        """Loads a program into new machines, which start from a cleared
+        RAM.
+
+        Args:
+            rom (typing.Sequence[int]): the instructions of the program.
+            lanes (int): the number of machines.
+        """
+        if np is None:
+            raise ImportError("BatchEmulator requires numpy")
+        if len(rom) > Emulator.rom_size:
+            raise ValueError("program has %d instructions, the ROM holds %d"
+                             % (len(rom), Emulator.rom_size))
+        if Emulator.dispatch_table is None:
+            Emulator.dispatch_table = Emulator.build_dispatch_table()
+        self.rom = np.zeros(Emulator.rom_size, dtype=np.uint16)
+        self.rom[:len(rom)] = rom
+        # the decoded instructions, like Emulator.code
+        self.code = [Emulator.dispatch_table[word] for word in self.rom.tolist()]
+        self.lanes = lanes
+        self.ram = np.zeros((lanes, Emulator.ram_size), dtype=np.uint16)
+        self.a = np.zeros(lanes, dtype=np.uint16)
+        self.d = np.zeros(lanes, dtype=np.uint16)
+        self.pc = np.zeros(lanes, dtype=np.uint16)
+        self.halted = np.zeros(lanes, dtype=bool)
+        self.faulted = np.zeros(lanes, dtype=bool)
+        self.cycles = np.zeros(lanes, dtype=np.int64)
+        self.steps = 0
+
+    @staticmethod
+    def load(path: str, lanes: int) -> "BatchEmulator":
+        """Loads a program from a .hack file or a ROM image.
+
+        Args:
+            path (str): the path of the program, see Emulator.load.
+            lanes (int): the number of machines.
+
+        Returns:
+            BatchEmulator: machines that are ready to run the program.
+        """
+        return BatchEmulator(Emulator.load(path).rom, lanes)
+
+    def peek(self, address: int) -> "np.ndarray":
+        """Reads a word of RAM on every lane.
+
+        Args:
+            address (int): the address to read.
+
+        Returns:
+            np.ndarray: the words, as signed integers.
+        """
+        return self.ram[:, address].view(np.int16)
+
+    def poke(self, address: int, values: typing.Union[int, typing.Sequence[int]]) -> None:
+        """Writes a word of RAM on every lane.
+
+        Args:
+            address (int): the address to write.
+            values (typing.Union[int, typing.Sequence[int]]): a word for all
+                the lanes, or one for each lane. Words can be either signed or
+                unsigned.
+        """
+        self.ram[:, address] = np.asarray(values, dtype=np.int64) & 0xFFFF
+
+    def run(self, cycles: typing.Optional[int] = None) -> int:
+        """Runs the program until every lane halted or faulted, see
+        Emulator.run. An invalid instruction raises an error before any lane
+        runs the step that reaches it.
+
+        Args:
+            cycles (typing.Optional[int]): the most steps to run, or None to
+                run until every lane halted or faulted.
+
+        Returns:
+            int: the number of steps that were run.
+        """
+        limit = sys.maxsize if cycles is None else cycles
+        steps = 0
+        while steps < limit:
+            running = np.flatnonzero(~(self.halted | self.faulted))
+            if running.size == 0:
+                break
+            pcs = self.pc[running]
+            if (pcs == pcs[0]).all():
+                # all the lanes are in step, which is the common case
+                groups = [(int(pcs[0]), running)]
+            else:
+                order = np.argsort(pcs, kind="stable")
+                pcs = pcs[order]
+                starts = np.flatnonzero(pcs[1:] != pcs[:-1]) + 1
+                groups = list(zip(pcs[np.r_[0, starts]].tolist(),
+                                  np.split(running[order], starts)))
+            # checked before any group runs, so no lane is left a step ahead
+            for address, lanes in groups:
+                if self.code[address] is None:
+                    raise ValueError(
+                        "pc %d: invalid instruction %s"
+                        % (address, format(int(self.rom[address]), "016b")))
+            for address, lanes in groups:
+                self.execute(address, lanes)
+            # a lane that faulted did not run its instruction
+            self.cycles[running[~self.faulted[running]]] += 1
+            steps += 1
+        self.steps += steps
+        return steps
+
+    def execute(self, address: int, lanes: "np.ndarray") -> None:
+        """Runs one valid instruction on some of the lanes.
+
+        Args:
+            address (int): the ROM address of the instruction.
+            lanes (np.ndarray): the indices of the lanes whose PC is address.
+        """
+        instruction = self.code[address]
+        next_address = (address + 1) & 0x7FFF
+        if instruction.__class__ is int:
+            self.a[lanes] = instruction
+            self.pc[lanes] = next_address
+            return
+        function, reads_m, dest, jump = instruction
+        a = self.a[lanes]
+        if reads_m or dest & 0b001:
+            out_of_range = a >= Emulator.ram_size
+            if out_of_range.any():
+                self.faulted[lanes[out_of_range]] = True
+                lanes = lanes[~out_of_range]
+                a = a[~out_of_range]
+        # the lanes left have a RAM address in A, which is also the jump
+        # target, where the PC takes the low 15 bits
+        address_m = a & 0x7FFF
+        if reads_m:
+            value = function(self.d[lanes], self.ram[lanes, address_m])
+        else:
+            value = function(self.d[lanes], a)
+        # computations that ignore their operands give a single word
+        value = np.broadcast_to(np.asarray(value, dtype=np.uint16), lanes.shape)
+        if dest & 0b001:
+            self.ram[lanes, address_m] = value
+        if dest & 0b010:
+            self.d[lanes] = value
+        if dest & 0b100:
+            self.a[lanes] = value
+        if jump is None:
+            self.pc[lanes] = next_address
+            return
+        zero, positive, negative = jump
+        taken = np.zeros(lanes.shape, dtype=bool)
+        if zero:
+            taken |= value == 0
+        if positive:
+            taken |= (value != 0) & (value < 0x8000)
+        if negative:
+            taken |= value >= 0x8000
+        self.pc[lanes] = np.where(taken, address_m, next_address)
+        if not dest and address and self.code[address - 1] == address - 1:
+            # lanes that jump back to this A-instruction halted, see
+            # Emulator.run
+            self.halted[lanes[taken & (a == address - 1)]] = True
+
+
+if "__main__" == __name__:
+    # Runs a program on every combination of the swept inputs, and prints a
+    # line with the inputs and the requested RAM words for every lane
+    arg_parser = argparse.ArgumentParser(
+        prog="BatchEmulator",
+        description="Runs an assembled Hack program on many inputs at once.")
+    arg_parser.add_argument(
+        "input_path", help="a .hack file or a ROM image")
+    arg_parser.add_argument(
+        "--cycles", type=int,
+        help="stop after this many steps (default: run until all halted)")
+    arg_parser.add_argument(
+        "--sweep", nargs="+", default=[], metavar="ADDRESS=START:STOP",
+        help="give a RAM word every value in the range, one lane per "
+             "combination of values")
+    arg_parser.add_argument(
+        "--dump", type=int, nargs="+", default=[], metavar="ADDRESS",
+        help="print these RAM words after running")
+    args = arg_parser.parse_args()
+
+    addresses = []
+    ranges = []
+    for sweep in args.sweep:
+        ram_address, _, value_range = sweep.partition("=")
+        start, _, stop = value_range.partition(":")
+        addresses.append(int(ram_address))
+        ranges.append(range(int(start), int(stop)))
+    inputs = list(itertools.product(*ranges))
+    emulator = BatchEmulator.load(args.input_path, len(inputs))
+    for ram_address, values in zip(addresses, zip(*inputs)):
+        emulator.poke(ram_address, values)
+    steps = emulator.run(args.cycles)
+    print("%d of %d lanes halted and %d faulted after %d steps" % (
+        int(emulator.halted.sum()), emulator.lanes,
+        int(emulator.faulted.sum()), steps))
+    outputs = [emulator.peek(ram_address).tolist() for ram_address in args.dump]
+    for lane, values in enumerate(inputs):
+        line = " ".join("RAM[%d]=%d" % item for item in itertools.chain(
+            zip(addresses, values),
+            zip(args.dump, (output[lane] for output in outputs))))
+        if emulator.faulted[lane]:
+            line += " faulted at pc %d: RAM address %d is out of range" % (
+                emulator.pc[lane], emulator.a[lane])
+        print(line)
@@ -0,0 +1,272 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import typing
+from array import array
+from Code import Code
+from HackWriter import HackWriter
+from Main import assemble_file
+from Parser import Parser
+from SymbolTable import SymbolTable
+
+# the largest address an A-instruction can hold
+MAX_ADDRESS = (1 << 15) - 1
+
+
+def generate_program(
+        output_file: typing.TextIO, lines: int, label_density: float = 0.05,
+        variables: int = 100, c_ratio: float = 0.5, comment_density: float = 0.05,
+        seed: int = 0) -> None:
+    """Writes a synthetic Hack assembly program. A-instructions are split
+    evenly between constants, predefined symbols, variables and labels. Labels
+    are only referenced if their address fits in an A-instruction, so the
+    program stays valid whatever its size.
+
+    Args:
+        output_file (typing.TextIO): writes the program to this file.
+        lines (int): the number of lines to write.
+        label_density (float): the fraction of lines that define a label.
+        variables (int): the number of distinct variables.
+        c_ratio (float): the fraction of instructions that are C-instructions.
+        comment_density (float): the fraction of lines that are comments.
+        seed (int): the seed of the random generator, so a program can be
+            generated again.
+    """
+    rng = random.Random(seed)
+    variables = min(variables, MAX_ADDRESS - 16)
+    comps = list(Code.comp_fields)
+    dests = list(Code.dest_fields)
+    jumps = list(Code.jump_fields)
+    predefined = list(SymbolTable().symbols_dict)
+    # deciding in advance where the labels go, so there are forward
+    # references as well as backward ones
+    kinds = rng.choices(("label", "comment", "instruction"),
+                        (label_density, comment_density,
+                         1 - label_density - comment_density), k=lines)
+    label_count = 0
+    instruction_num = 0
+    for kind in kinds:
+        if kind == "label":
+            if instruction_num <= MAX_ADDRESS:
+                label_count += 1
+        elif kind == "instruction":
+            instruction_num += 1
+    label_num = 0
+    chunk = []
+    for kind in kinds:
+        if kind == "label":
+            chunk.append("(LABEL_" + str(label_num) + ")\n")
+            label_num += 1
+        elif kind == "comment":
+            chunk.append("// synthetic comment\n")
+        elif rng.random() < c_ratio:
+            dest = rng.choice(dests)
+            jump = rng.choice(jumps)
+            line = rng.choice(comps)
+            if dest != "null":
+                line = dest + "=" + line
+            if jump != "null":
+                line += ";" + jump
+            chunk.append("    " + line + "\n")
+        else:
+            target = rng.randrange(4)
+            # a variable or label that does not exist is replaced by a label
+            # or a constant
+            if target == 2 and variables == 0:
+                target = 3
+            if target == 3 and label_count == 0:
+                target = 0
+            if target == 0:
+                chunk.append("    @" + str(rng.randrange(MAX_ADDRESS + 1)) + "\n")
+            elif target == 1:
+                chunk.append("    @" + rng.choice(predefined) + "\n")
+            elif target == 2:
+                chunk.append("    @var_" + str(rng.randrange(variables)) + "\n")
+            else:
+                chunk.append("    @LABEL_" + str(rng.randrange(label_count)) + "\n")
+        if len(chunk) >= 4096:
+            output_file.writelines(chunk)
+            chunk = []
+    output_file.writelines(chunk)
+
+
+def best_time(function: typing.Callable[[], typing.Any],
+              repeat: int) -> typing.Tuple[float, typing.Any]:
+    """
+    Args:
+        function (typing.Callable[[], typing.Any]): the code to time.
+        repeat (int): the number of times to run it.
+
+    Returns:
+        typing.Tuple[float, typing.Any]: the shortest run time, in seconds,
+        and what the last run returned.
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def benchmark_file(input_path: str, output_path: str,
+                   repeat: int = 3) -> typing.Dict[str, typing.Any]:
+    """Times the assembly of a file, end to end and phase by phase. The
+    assembler runs its phases fused into a single pass, so here each phase
+    runs on its own over the output of the previous one, and the phase times
+    do not add up exactly to the total.
+
+    Args:
+        input_path (str): the .asm file.
+        output_path (str): where to write the .hack file.
+        repeat (int): the number of runs, the best one is reported.
+
+    Returns:
+        typing.Dict[str, typing.Any]: the results.
+    """
+    with open(input_path, 'r') as input_file:
+        lines = sum(1 for _ in input_file)
+
+    def parse() -> typing.List:
+        with open(input_path, 'r') as input_file:
+            return list(Parser(input_file).instructions())
+
+    def label_pass() -> SymbolTable:
+        symbol_table = SymbolTable()
+        for kind, word, symbol, address, line in instructions:
+            if kind == "L_COMMAND":
+                symbol_table.add_entry(symbol, address)
+        n = 16
+        for kind, word, symbol, address, line in instructions:
+            if kind == "A_COMMAND" and symbol is not None \
+                    and symbol_table.get_address(symbol) is None:
+                symbol_table.add_entry(symbol, n, SymbolTable.VARIABLE)
+                n += 1
+        return symbol_table
+
+    def encode() -> array:
+        words = array("H")
+        addresses = symbol_table.addresses
+        intern = symbol_table.intern
+        for kind, word, symbol, address, line in instructions:
+            if symbol is None:
+                words.append(word)
+            elif kind == "A_COMMAND":
+                words.append(addresses[intern(symbol)])
+        return words
+
+    def write() -> None:
+        with open(output_path, 'w') as output_file:
+            writer = HackWriter(output_file)
+            writer.write_all(words)
+            writer.close()
+
+    def assemble() -> None:
+        with open(input_path, 'r') as input_file, \
+                open(output_path, 'w') as output_file:
+            assemble_file(input_file, output_file)
+
+    phases = dict()
+    phases["parse"], instructions = best_time(parse, repeat)
+    phases["label_pass"], symbol_table = best_time(label_pass, repeat)
+    phases["encode"], words = best_time(encode, repeat)
+    phases["write"], _ = best_time(write, repeat)
+    total, _ = best_time(assemble, repeat)
+    instruction_count = len(words)
+    del instructions, words
+
+    # tracing slows everything down, so memory is measured in a run of its own
+    tracemalloc.start()
+    assemble()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"lines": lines, "instructions": instruction_count,
+            "phases": phases, "total": total, "lines_per_second": lines / total,
+            "peak_memory": peak_memory}
+
+
+def git_commit() -> typing.Optional[str]:
+    """
+    Returns:
+        typing.Optional[str]: the commit the assembler is at, None if it is
+        not in a git repository.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if "__main__" == __name__:
+    # Generates a synthetic program for every requested size, benchmarks the
+    # assembler on it and writes the results as JSON, so runs can be compared
+    # across commits.
+    arg_parser = argparse.ArgumentParser(
+        prog="Benchmark", description="Benchmarks the Hack assembler.")
+    arg_parser.add_argument(
+        "--lines", type=int, nargs="+", default=[100000],
+        help="the sizes of the generated programs, in lines (default: 100000)")
+    arg_parser.add_argument("--label-density", type=float, default=0.05)
+    arg_parser.add_argument("--variables", type=int, default=100)
+    arg_parser.add_argument("--c-ratio", type=float, default=0.5)
+    arg_parser.add_argument("--comment-density", type=float, default=0.05)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument(
+        "--output", help="write the results to this file instead of stdout")
+    args = arg_parser.parse_args()
+    if any(lines < 0 for lines in args.lines):
+        arg_parser.error("--lines must be 0 or more")
+    for name, fraction in (("--label-density", args.label_density),
+                           ("--c-ratio", args.c_ratio),
+                           ("--comment-density", args.comment_density)):
+        if not 0 <= fraction <= 1:
+            arg_parser.error(name + " must be between 0 and 1")
+    if args.label_density + args.comment_density > 1:
+        arg_parser.error("--label-density and --comment-density must add up "
+                         "to 1 or less")
+    if args.variables < 0:
+        arg_parser.error("--variables must be 0 or more")
+    if args.repeat < 1:
+        arg_parser.error("--repeat must be 1 or more")
+
+    results = {"commit": git_commit(), "python": platform.python_version(),
+               "parameters": {"label_density": args.label_density,
+                              "variables": args.variables, "c_ratio": args.c_ratio,
+                              "comment_density": args.comment_density,
+                              "seed": args.seed, "repeat": args.repeat},
+               "runs": []}
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, "Synthetic.asm")
+        output_path = os.path.join(directory, "Synthetic.hack")
+        for lines in args.lines:
+            with open(input_path, 'w') as input_file:
+                generate_program(input_file, lines, args.label_density,
+                                 args.variables, args.c_ratio,
+                                 args.comment_density, args.seed)
+            results["runs"].append(benchmark_file(input_path, output_path, args.repeat))
+    report = json.dumps(results, indent=4)
+    if args.output is None:
+        print(report)
+    else:
+        with open(args.output, 'w') as output_file:
+            output_file.write(report + "\n")
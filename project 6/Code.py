@@ -10,59 +10,78 @@ Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 class Code:
     """Translates Hack assembly language mnemonics into binary codes."""
 
-    comp_dict = {"0": "0101010", "1": "0111111", "-1": "0111010", "D": "0001100",
-                 "A": "0110000", "!D": "0001101", "!A": "0110001", "-D": "0001111",
-                 "-A": "0110011", "D+1": "0011111", "A+1": "0110111", "D-1": "0001110",
-                 "A-1": "0110010", "D+A": "0000010", "D-A": "0010011", "A-D": "0000111",
-                 "D&A": "0000000", "D|A": "0010101", "M": "1110000", "!M": "1110001",
-                 "-M": "1110011", "M+1": "1110111", "M-1": "1110010", "D+M": "1000010",
-                 "D-M": "1010011", "M-D": "1000111", "D&M": "1000000", "D|M": "1010101"}
+    comp_dict = {"0": 0b0101010, "1": 0b0111111, "-1": 0b0111010, "D": 0b0001100,
+                 "A": 0b0110000, "!D": 0b0001101, "!A": 0b0110001, "-D": 0b0001111,
+                 "-A": 0b0110011, "D+1": 0b0011111, "A+1": 0b0110111, "D-1": 0b0001110,
+                 "A-1": 0b0110010, "D+A": 0b0000010, "D-A": 0b0010011, "A-D": 0b0000111,
+                 "D&A": 0b0000000, "D|A": 0b0010101, "M": 0b1110000, "!M": 0b1110001,
+                 "-M": 0b1110011, "M+1": 0b1110111, "M-1": 0b1110010, "D+M": 0b1000010,
+                 "D-M": 0b1010011, "M-D": 0b1000111, "D&M": 0b1000000, "D|M": 0b1010101}
 
-    jump_dict = {"null": "000", "JGT": "001", "JEQ": "010", "JGE": "011",
-                 "JLT": "100", "JNE": "101", "JLE": "110", "JMP": "111"}
+    # shift instructions, which use the "101" prefix instead of "111"
+    extended_comp_dict = {"A<<": 0b0100000, "D<<": 0b0110000, "M<<": 0b1100000,
+                          "A>>": 0b0000000, "D>>": 0b0010000, "M>>": 0b1000000}
+
+    jump_dict = {"null": 0b000, "JGT": 0b001, "JEQ": 0b010, "JGE": 0b011,
+                 "JLT": 0b100, "JNE": 0b101, "JLE": 0b110, "JMP": 0b111}
 
     dest_dict = dict()
-    dest_dict["null"] = "000"
-    dest_dict["M"] = "001"
-    dest_dict["D"] = "010"
-    dest_dict["MD"] = "011"
-    dest_dict["A"] = "100"
-    dest_dict["AM"] = "101"
-    dest_dict["AD"] = "110"
-    dest_dict["AMD"] = "111"
+    dest_dict["null"] = 0b000
+    dest_dict["M"] = 0b001
+    dest_dict["D"] = 0b010
+    dest_dict["MD"] = 0b011
+    dest_dict["A"] = 0b100
+    dest_dict["AM"] = 0b101
+    dest_dict["AD"] = 0b110
+    dest_dict["AMD"] = 0b111
+
+    # the fields are stored already shifted into place (comp together with
+    # the instruction prefix), so a C-instruction is comp | dest | jump
+    comp_fields = {mnemonic: 0b111 << 13 | bits << 6 for mnemonic, bits in comp_dict.items()}
+    comp_fields.update({mnemonic: 0b101 << 13 | bits << 6
+                        for mnemonic, bits in extended_comp_dict.items()})
+    dest_fields = {mnemonic: bits << 3 for mnemonic, bits in dest_dict.items()}
+    jump_fields = jump_dict
+
+    # hack_lines[word] is the line that represents word in a .hack file
+    hack_lines = [format(word, "016b") + "\n" for word in range(1 << 16)]
 
     @staticmethod
-    def dest(mnemonic: str) -> str:
+    def dest(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a dest mnemonic string.
 
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: the dest bits of the given mnemonic, in their place in the
+            instruction.
         """
         # Your code goes here!
-        return Code.dest_dict.get(mnemonic)
+        return Code.dest_fields.get(mnemonic)
 
     @staticmethod
-    def comp(mnemonic: str) -> str:
+    def comp(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a comp mnemonic string.
 
         Returns:
-            str: the binary code of the given mnemonic.
+            int: the comp bits of the given mnemonic together with the
+            instruction prefix ("111", or "101" for shifts), in their place in
+            the instruction.
         """
         # Your code goes here!
-        return Code.comp_dict.get(mnemonic)
+        return Code.comp_fields.get(mnemonic)
 
     @staticmethod
-    def jump(mnemonic: str) -> str:
+    def jump(mnemonic: str) -> int:
         """
         Args:
             mnemonic (str): a jump mnemonic string.
 
         Returns:
-            str: 3-bit long binary code of the given mnemonic.
+            int: the jump bits of the given mnemonic, in their place in the
+            instruction.
         """
         # Your code goes here!
-        return Code.jump_dict.get(mnemonic)
+        return Code.jump_fields.get(mnemonic)
@@ -0,0 +1,43 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class Command:
+    """A single parsed assembly command. The Parser builds one for every
+    command it reads, so the command is classified and its fields are
+    encoded exactly once, and whoever consumes it (the assembler, or tools
+    such as a listing or a debugger) never has to look at the text again.
+    """
+
+    __slots__ = ("kind", "word", "symbol", "address", "line")
+
+    def __init__(self, kind: str, word: int, symbol: typing.Optional[str],
+                 address: int, line: int) -> None:
+        """Creates a new command.
+
+        Args:
+            kind (str): "A_COMMAND", "C_COMMAND" or "L_COMMAND", like
+                Parser.command_type().
+            word (int): the encoded instruction. For an A-command with a
+                symbol, 0 until the symbol is resolved.
+            symbol (typing.Optional[str]): the symbol of an A-command or of
+                an L-command, None if there is none.
+            address (int): the ROM address of the instruction. For an
+                L-command, the address of the instruction it labels.
+            line (int): the line number in the source, counting from 1.
+        """
+        self.kind = kind
+        self.word = word
+        self.symbol = symbol
+        self.address = address
+        self.line = line
+
+    def __repr__(self) -> str:
+        return "Command(%r, %r, %r, %r, %r)" % (
+            self.kind, self.word, self.symbol, self.address, self.line)
@@ -0,0 +1,605 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import sys
+import typing
+from array import array
+from RomImage import RomImage
+
+
+class Emulator:
+    """Runs assembled Hack programs on the CPU of project 5, including the
+    shift instructions of CpuMul.
+
+    Registers and memory hold unsigned 16-bit words. Every instruction word is
+    decoded once into the dispatch table, and the program is translated
+    through it when it is loaded, so running an instruction is a list lookup
+    and a few local variable updates. Programs that run for long can instead
+    be compiled into Python functions, one per block of instructions.
+    """
+
+    # the sizes of the instruction and data memories, in words
+    rom_size = 1 << 15
+    ram_size = 1 << 15
+
+    # reasons for run to return
+    HALTED = "HALTED"
+    BREAKPOINT = "BREAKPOINT"
+    CYCLE_LIMIT = "CYCLE_LIMIT"
+
+    # the jump bits, mapped to whether the jump is taken when the computed
+    # value is zero, positive or negative
+    jump_conditions = [None] + [
+        (bool(jump & 0b010), bool(jump & 0b001), bool(jump & 0b100))
+        for jump in range(1, 8)]
+
+    # the zx, nx, zy, ny, f and no bits of the documented computations,
+    # mapped to their expressions over x, the D register, and y, the A
+    # register or M
+    alu_expressions = {
+        0b101010: "0", 0b111111: "1", 0b111010: "65535", 0b001100: "{x}",
+        0b110000: "{y}", 0b001101: "{x} ^ 65535", 0b110001: "{y} ^ 65535",
+        0b001111: "-{x} & 65535", 0b110011: "-{y} & 65535",
+        0b011111: "({x} + 1) & 65535", 0b110111: "({y} + 1) & 65535",
+        0b001110: "({x} - 1) & 65535", 0b110010: "({y} - 1) & 65535",
+        0b000010: "({x} + {y}) & 65535", 0b010011: "({x} - {y}) & 65535",
+        0b000111: "({y} - {x}) & 65535", 0b000000: "{x} & {y}",
+        0b010101: "{x} | {y}"}
+
+    # entry i holds the decoded instruction word i: A-instructions are kept
+    # as the value they load, C-instructions as a tuple of the function that
+    # computes them, whether they read M, their dest bits and their jump
+    # condition. Words that are not valid instructions are None
+    dispatch_table = None
+
+    # the most instructions a compiled block runs before it returns
+    block_size = 256
+
+    # the jump bits, mapped to the condition on v, the computed value, under
+    # which the jump is taken
+    jump_sources = [None, "0 < v < 32768", "v == 0", "v < 32768", "v > 32767",
+                    "v != 0", "not 0 < v < 32768", "True"]
+
+    # the source of every compiled block, mapped to its code object, so
+    # machines that run the same program only compile it once
+    block_code = dict()
+
+    def __init__(self, rom: typing.Sequence[int], jit: bool = False) -> None:
+        """Loads a program into a new machine. The machine starts from a
+        cleared RAM, as after a reset.
+
+        Args:
+            rom (typing.Sequence[int]): the instructions of the program.
+            jit (bool): if this is True, run compiles the program into Python
+                functions block by block as it reaches them, instead of
+                running one instruction at a time, see compile_block.
+        """
+        if len(rom) > Emulator.rom_size:
+            raise ValueError("program has %d instructions, the ROM holds %d"
+                             % (len(rom), Emulator.rom_size))
+        if Emulator.dispatch_table is None:
+            Emulator.dispatch_table = Emulator.build_dispatch_table()
+        self.rom = array("H", rom)
+        self.rom.frombytes(bytes(2 * (Emulator.rom_size - len(rom))))
+        # a list and not an array, so reading a word does not create a new
+        # int object every time
+        self.ram = [0] * Emulator.ram_size
+        # the program as decoded instructions, addressed like the ROM
+        self.code = [Emulator.dispatch_table[word] for word in self.rom]
+        self.breakpoints = set()
+        self.jit = jit
+        # the compiled blocks, by the address they start from
+        self.blocks = [None] * Emulator.rom_size
+        self.a = 0
+        self.d = 0
+        self.pc = 0
+        self.cycles = 0
+
+    @staticmethod
+    def load(path: str, jit: bool = False) -> "Emulator":
+        """Loads a program from a .hack file or a ROM image.
+
+        Args:
+            path (str): the path of the program. Files that end with
+                RomImage.extension are read as ROM images.
+            jit (bool): whether to compile the program, see __init__.
+
+        Returns:
+            Emulator: a machine that is ready to run the program.
+        """
+        if path.endswith(RomImage.extension):
+            return Emulator(RomImage.load(path), jit)
+        with open(path, 'r') as input_file:
+            return Emulator([int(line, 2) for line in input_file
+                             if not line.isspace()], jit)
+
+    @staticmethod
+    def comp_expression(word: int, x: str = "x", y: str = "y") -> typing.Optional[str]:
+        """Writes the computation of a C-instruction as a Python expression.
+        The documented computations get the simplest expression, any other
+        combination of control bits is written out the way the ALU computes
+        it.
+
+        Args:
+            word (int): the instruction.
+            x (str): the expression that reads the D register.
+            y (str): the expression that reads the A register or M, whichever
+                the instruction uses.
+
+        Returns:
+            typing.Optional[str]: the expression, whose value is an unsigned
+            16-bit word, or None if the word is not a C-instruction.
+        """
+        prefix = word >> 13
+        if prefix == 0b101:
+            # shift: c1 picks the direction and c2 the operand. Right shifts
+            # are arithmetic, so they keep the sign bit
+            operand = x if word & (1 << 10) else y
+            if word & (1 << 11):
+                return "(%s << 1) & 65535" % operand
+            return "(%s >> 1) | (%s & 32768)" % (operand, operand)
+        if prefix != 0b111:
+            return None
+        control = (word >> 6) & 0b111111
+        expression = Emulator.alu_expressions.get(control)
+        if expression is None:
+            zx, nx, zy, ny, f, no = [(control >> bit) & 1 for bit in range(5, -1, -1)]
+            left = "0" if zx else "{x}"
+            if nx:
+                left = "65535" if zx else "({x} ^ 65535)"
+            right = "0" if zy else "{y}"
+            if ny:
+                right = "65535" if zy else "({y} ^ 65535)"
+            if f:
+                if "0" in (left, right):
+                    expression = right if left == "0" else left
+                else:
+                    expression = "((%s + %s) & 65535)" % (left, right)
+            elif "0" in (left, right):
+                expression = "0"
+            elif "65535" in (left, right):
+                expression = right if left == "65535" else left
+            else:
+                expression = "(%s & %s)" % (left, right)
+            if no:
+                expression = "(%s ^ 65535)" % expression
+        return expression.format(x=x, y=y)
+
+    @staticmethod
+    def build_dispatch_table() -> typing.List:
+        """Decodes every possible instruction word.
+
+        Returns:
+            typing.List: the decoded instructions, see dispatch_table.
+        """
+        table = list(range(1 << 15))
+        functions = dict()
+        for word in range(1 << 15, 1 << 16):
+            expression = Emulator.comp_expression(word)
+            if expression is None:
+                table.append(None)
+                continue
+            function = functions.get(expression)
+            if function is None:
+                function = functions[expression] = eval(
+                    "lambda x, y: " + expression)
+            dest = (word >> 3) & 0b111
+            jump = word & 0b111
+            # M is only read if the value it computes is used
+            reads_m = bool(word & (1 << 12) and "y" in expression and (dest or jump))
+            table.append((function, reads_m, dest, Emulator.jump_conditions[jump]))
+        return table
+
+    def reset(self) -> None:
+        """Restarts the program from its first instruction. Memory is kept,
+        like the reset button of the Hack computer.
+        """
+        self.pc = 0
+
+    def peek(self, address: int) -> int:
+        """Reads a word of RAM.
+
+        Args:
+            address (int): the address to read.
+
+        Returns:
+            int: the word, as a signed integer.
+        """
+        value = self.ram[address]
+        return value - ((value & 0x8000) << 1)
+
+    def poke(self, address: int, value: int) -> None:
+        """Writes a word of RAM.
+
+        Args:
+            address (int): the address to write.
+            value (int): the word, either signed or unsigned.
+        """
+        self.ram[address] = value & 0xFFFF
+
+    def add_breakpoint(self, address: int) -> None:
+        """Stops run before the instruction at the given address.
+
+        Args:
+            address (int): the ROM address of the instruction.
+        """
+        self.breakpoints.add(address)
+        # compiled blocks may run through the new breakpoint
+        self.blocks = [None] * Emulator.rom_size
+
+    def remove_breakpoint(self, address: int) -> None:
+        """Removes a breakpoint, if it was set.
+
+        Args:
+            address (int): the ROM address of the instruction.
+        """
+        self.breakpoints.discard(address)
+        self.blocks = [None] * Emulator.rom_size
+
+    def run(self, cycles: typing.Optional[int] = None) -> str:
+        """Runs the program until it stops. A program stops when it halts,
+        which is when it is stuck in a loop that jumps back to the
+        A-instruction before it without changing any state, like the usual
+        "(END) @END 0;JMP".
+
+        Args:
+            cycles (typing.Optional[int]): the most instructions to run, or
+                None to run until the program halts or reaches a breakpoint.
+
+        Returns:
+            str: why the program stopped, Emulator.HALTED, BREAKPOINT or
+            CYCLE_LIMIT. The state of the machine is kept, so run can be
+            called again to continue.
+        """
+        limit = sys.maxsize if cycles is None else cycles
+        code = self.code
+        if self.breakpoints:
+            if limit > 0 and self.pc in self.breakpoints:
+                # resuming from a breakpoint: get past it before stopping at
+                # breakpoints again
+                reason = self.execute(code, 1)
+                if reason != Emulator.CYCLE_LIMIT or limit == 1:
+                    return reason
+                limit -= 1
+            # breakpoints are marked by None, which stops execute like an
+            # invalid instruction does
+            code = list(code)
+            for address in self.breakpoints:
+                code[address] = None
+        if self.jit:
+            executed = self.cycles
+            reason = self.execute_blocks(limit)
+            if reason != Emulator.CYCLE_LIMIT:
+                return reason
+            # the last few instructions before the limit may end in the middle
+            # of a block, so they are run one at a time
+            limit -= self.cycles - executed
+        return self.execute(code, limit)
+
+    def execute(self, code: typing.List, limit: int) -> str:
+        """Runs decoded instructions. This is the inner loop of run, which
+        keeps the registers in local variables while it goes.
+
+        Args:
+            code (typing.List): the decoded program.
+            limit (int): the most instructions to run.
+
+        Returns:
+            str: why the instructions stopped, like for run.
+        """
+        ram = self.ram
+        a, d, pc = self.a, self.d, self.pc
+        start = self.cycles
+        executed = 0
+        reason = Emulator.CYCLE_LIMIT
+        while True:
+            try:
+                for executed in range(executed, limit):
+                    instruction = code[pc]
+                    if instruction.__class__ is int:
+                        a = instruction
+                        pc += 1
+                        continue
+                    function, reads_m, dest, jump = instruction
+                    pc += 1
+                    value = function(d, ram[a] if reads_m else a)
+                    target = a
+                    if dest:
+                        # M is written to the address A had before this
+                        # instruction, like the jump target
+                        if dest & 0b001:
+                            ram[a] = value
+                        if dest & 0b010:
+                            d = value
+                        if dest & 0b100:
+                            a = value
+                    if jump is not None and jump[
+                            0 if value == 0 else (2 if value & 0x8000 else 1)]:
+                        if (target == pc - 2 and code[target] == target
+                                and not dest):
+                            pc = target
+                            executed += 1
+                            reason = Emulator.HALTED
+                            break
+                        pc = target & 0x7FFF
+                else:
+                    executed = limit
+                break
+            except IndexError:
+                if pc != Emulator.rom_size or a >= Emulator.ram_size:
+                    self.a, self.d, self.pc = a, d, pc - 1
+                    self.cycles = start + executed
+                    raise ValueError("pc %d: RAM address %d is out of range"
+                                     % (pc - 1, a)) from None
+                # the PC is 15 bits wide, so it wraps around the end of ROM
+                pc = 0
+            except TypeError:
+                # unpacking a breakpoint or an invalid instruction
+                if code[pc] is not None:
+                    raise
+                reason = Emulator.BREAKPOINT
+                break
+        self.a, self.d, self.pc = a, d, pc & 0x7FFF
+        self.cycles = start + executed
+        if reason == Emulator.BREAKPOINT and self.code[pc] is None:
+            raise ValueError("pc %d: invalid instruction %s"
+                             % (pc, format(self.rom[pc], "016b")))
+        return reason
+
+    def compile_block(self, address: int) -> typing.Callable:
+        """Compiles the instructions from the given address into a Python
+        function, see block_source.
+
+        Args:
+            address (int): the address of the first instruction.
+
+        Returns:
+            typing.Callable: a function that takes A and D and returns the
+            next PC, A, D and the number of instructions it ran. A PC past
+            the end of ROM means the program halted at PC - Emulator.rom_size.
+        """
+        source = self.block_source(address)[0]
+        code = Emulator.block_code.get(source)
+        if code is None:
+            code = Emulator.block_code[source] = compile(
+                source, "<block %d>" % address, "exec")
+        namespace = {"ram": self.ram}
+        exec(code, namespace)
+        return namespace["block_%d" % address]
+
+    def block_source(self, address: int) -> typing.Tuple[str, typing.Dict]:
+        """Translates the instructions from the given address into the source
+        of a Python function. The function keeps A and D in local variables
+        and folds constant addresses into its RAM accesses. Conditional jumps
+        become early returns, and unconditional jumps to a constant address
+        are followed into the same function, so a block goes on until an
+        indirect jump, a jump back into itself, a breakpoint or
+        Emulator.block_size instructions.
+
+        Args:
+            address (int): the address of the first instruction.
+
+        Returns:
+            typing.Tuple[str, typing.Dict]: the source of the function, and
+            its lines mapped to the address of their instruction, the sources
+            of A and D before it and the number of instructions before it.
+        """
+        rom = self.rom
+        start = address
+        lines = ["def block_%d(a, d, ram=ram):" % start]
+        # the values of A and D when they are known while compiling,
+        # otherwise the registers are in the local variables a and d
+        a_value = None
+        d_value = None
+        visited = set()
+        count = 0
+        exit_source = "    return %s, %s, %s, %d"
+        faults = dict()
+        while True:
+            register_a = "a" if a_value is None else str(a_value)
+            register_d = "d" if d_value is None else str(d_value)
+            if (count == Emulator.block_size or address in visited
+                    or (count and address in self.breakpoints)):
+                lines.append(exit_source % (address, register_a, register_d, count))
+                break
+            word = rom[address]
+            if word < 0x8000:
+                visited.add(address)
+                count += 1
+                a_value = word
+                address = (address + 1) & 0x7FFF
+                continue
+            if word & 0x1000:
+                operand = "ram[%s]" % register_a
+            else:
+                operand = register_a
+            expression = Emulator.comp_expression(word, register_d, operand)
+            if expression is None:
+                if not count:
+                    raise ValueError("pc %d: invalid instruction %s"
+                                     % (address, format(word, "016b")))
+                # stop before it, so run reports it at its own address
+                lines.append(exit_source % (address, register_a, register_d, count))
+                break
+            # the lines of this instruction, which run with the registers it
+            # starts with
+            first_line = len(lines) + 1
+            fault = (address, register_a, register_d, count)
+            visited.add(address)
+            count += 1
+            dest = (word >> 3) & 0b111
+            jump = word & 0b111
+            if not dest and not jump:
+                # the value is not used, so the instruction does nothing
+                address = (address + 1) & 0x7FFF
+                continue
+            if "a" not in expression and "d" not in expression:
+                # the operands are known, so is the value
+                expression = str(eval(expression))
+            elif operand.startswith("ram") and expression.count(operand) > 1:
+                lines.append("    y = %s" % operand)
+                expression = Emulator.comp_expression(word, register_d, "y")
+            value = expression
+            if (jump or dest & (dest - 1)) and not expression.isidentifier() \
+                    and not expression.isdigit():
+                lines.append("    v = %s" % expression)
+                value = "v"
+            # the jump target and M both use the value A had before
+            target = a_value
+            if dest & 0b001:
+                lines.append("    ram[%s] = %s" % (register_a, value))
+            if dest & 0b100 and jump and a_value is None:
+                lines.append("    t = a")
+                register_a = "t"
+            if dest & 0b010:
+                if value.isdigit():
+                    d_value = int(value)
+                else:
+                    if value != "d":
+                        lines.append("    d = %s" % value)
+                    d_value = None
+            if dest & 0b100:
+                if value.isdigit():
+                    a_value = int(value)
+                else:
+                    if value != "a":
+                        lines.append("    a = %s" % value)
+                    a_value = None
+            for line in range(first_line, len(lines) + 1):
+                faults[line] = fault
+            next_address = (address + 1) & 0x7FFF
+            if not jump:
+                address = next_address
+                continue
+            if target is None:
+                target_source = "%s & 32767" % register_a
+            else:
+                target_source = str(target & 0x7FFF)
+                if (target == address - 1 and rom[target] == target
+                        and not dest):
+                    # jumping back to its own A-instruction without changing
+                    # anything, the program can never leave this loop
+                    target_source = str(Emulator.rom_size + target)
+            condition = Emulator.jump_sources[jump]
+            if value.isdigit():
+                condition = str(eval(condition.replace("v", value)))
+            register_a = "a" if a_value is None else str(a_value)
+            register_d = "d" if d_value is None else str(d_value)
+            if condition == "True":
+                if (target is not None and target not in visited
+                        and target_source == str(target)):
+                    address = target
+                    continue
+                lines.append(exit_source % (target_source, register_a, register_d, count))
+                break
+            if condition != "False":
+                lines.append("    if %s:" % condition.replace("v", value))
+                lines.append("    " + exit_source % (target_source, register_a, register_d, count))
+            address = next_address
+        return "\n".join(lines) + "\n", faults
+
+    def execute_blocks(self, limit: int) -> str:
+        """Runs the program as compiled blocks, compiling every block the
+        first time it is reached. Blocks are run as long as a whole block
+        fits within the limit.
+
+        Args:
+            limit (int): the most instructions to run.
+
+        Returns:
+            str: why the blocks stopped, like for run.
+        """
+        blocks = self.blocks
+        a, d, pc = self.a, self.d, self.pc
+        budget = limit - Emulator.block_size
+        executed = 0
+        reason = Emulator.CYCLE_LIMIT
+        while True:
+            try:
+                while executed <= budget:
+                    pc, a, d, count = blocks[pc](a, d)
+                    executed += count
+                if pc >= Emulator.rom_size:
+                    # the last block that ran halted
+                    pc -= Emulator.rom_size
+                    reason = Emulator.HALTED
+                break
+            except TypeError:
+                # calling a block that was not compiled yet
+                if blocks[pc] is not None:
+                    raise
+                if pc in self.breakpoints:
+                    reason = Emulator.BREAKPOINT
+                    break
+                try:
+                    blocks[pc] = self.compile_block(pc)
+                except ValueError:
+                    self.a, self.d, self.pc = a, d, pc
+                    self.cycles += executed
+                    raise
+            except IndexError as error:
+                if pc < Emulator.rom_size:
+                    # the instructions before the one that failed already
+                    # ran, so the state is taken from the line of the block
+                    # that failed, like execute would have stopped there.
+                    # The block is translated again to find its lines
+                    traceback = error.__traceback__.tb_next
+                    faults = self.block_source(pc)[1]
+                    pc, a, d, count = faults[traceback.tb_lineno]
+                    registers = traceback.tb_frame.f_locals
+                    a = registers[a] if a.isidentifier() else int(a)
+                    d = registers[d] if d.isidentifier() else int(d)
+                    self.a, self.d, self.pc = a, d, pc
+                    self.cycles += executed + count
+                    raise ValueError("pc %d: RAM address %d is out of range"
+                                     % (pc, a)) from None
+                pc -= Emulator.rom_size
+                reason = Emulator.HALTED
+                break
+        self.a, self.d, self.pc = a, d, pc
+        self.cycles += executed
+        return reason
+
+
+if "__main__" == __name__:
+    # Runs a program and prints the state of the machine when it stops,
+    # followed by the requested RAM words
+    arg_parser = argparse.ArgumentParser(
+        prog="Emulator", description="Runs an assembled Hack program.")
+    arg_parser.add_argument(
+        "input_path", help="a .hack file or a ROM image")
+    arg_parser.add_argument(
+        "--cycles", type=int,
+        help="stop after this many instructions (default: run until halted)")
+    arg_parser.add_argument(
+        "--break", type=int, nargs="+", default=[], dest="breakpoints",
+        metavar="ADDRESS", help="stop before the instructions at these addresses")
+    arg_parser.add_argument(
+        "--set", nargs="+", default=[], metavar="ADDRESS=VALUE",
+        help="write these RAM words before running")
+    arg_parser.add_argument(
+        "--dump", nargs="+", default=[], metavar="START[:END]",
+        help="print these RAM words after running")
+    arg_parser.add_argument(
+        "--jit", action="store_true",
+        help="compile the program into Python functions as it runs")
+    args = arg_parser.parse_args()
+
+    emulator = Emulator.load(args.input_path, args.jit)
+    for assignment in args.set:
+        address, value = assignment.split("=")
+        emulator.poke(int(address), int(value))
+    for breakpoint_address in args.breakpoints:
+        emulator.add_breakpoint(breakpoint_address)
+    stop_reason = emulator.run(args.cycles)
+    print("%s after %d cycles: A=%d D=%d PC=%d" % (
+        stop_reason, emulator.cycles, emulator.a, emulator.d, emulator.pc))
+    for memory_range in args.dump:
+        start, _, end = memory_range.partition(":")
+        for ram_address in range(int(start), int(end or start) + 1):
+            print("RAM[%d] = %d" % (ram_address, emulator.peek(ram_address)))
@@ -0,0 +1,101 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import io
+import sys
+import typing
+from array import array
+from Code import Code
+from RomImage import RomImage
+
+
+class HackWriter:
+    """Writes assembled instructions to the output file while they are being
+    produced, in .hack text or as a ROM image. Instructions that refer to a
+    symbol which is not resolved yet are written as placeholders, and are
+    patched in place once the symbol's address is known.
+    If the output file is not seekable, the instructions are kept in memory
+    and written when the writer is closed.
+    """
+
+    # number of instructions collected before they are written
+    chunk_size = 8192
+
+    def __init__(self, output_file: typing.IO, binary: bool = False) -> None:
+        """Gets ready to write to the output file.
+
+        Args:
+            output_file (typing.IO): the file to write to.
+            binary (bool): if this is True, output_file is opened in binary
+                mode and a ROM image is written to it instead of .hack text.
+        """
+        self.output_file = output_file
+        self.binary = binary
+        self.seekable = output_file.seekable()
+        self.start = output_file.tell() if self.seekable else 0
+        self.pending = array("H")  # instructions that were not written yet
+        # instructions are only kept back until the end if they can't be
+        # patched in the output file
+        self.pending_limit = HackWriter.chunk_size if self.seekable else sys.maxsize
+        self.written = 0  # number of instructions already in output_file
+
+    def write(self, word: int) -> None:
+        """Writes the next instruction.
+
+        Args:
+            word (int): the instruction.
+        """
+        self.pending.append(word)
+        if len(self.pending) >= self.pending_limit:
+            self.flush()
+
+    def write_all(self, words: typing.Iterable[int]) -> None:
+        """Writes a sequence of instructions at once.
+
+        Args:
+            words (typing.Iterable[int]): the instructions.
+        """
+        self.pending.extend(words)
+        if len(self.pending) >= self.pending_limit:
+            self.flush()
+
+    def patch(self, indices: typing.Iterable[int], word: int) -> None:
+        """Replaces instructions that were already written.
+
+        Args:
+            indices (typing.Iterable[int]): the indices of the instructions,
+                counting from the first instruction this writer wrote.
+            word (int): the instruction to write at these indices.
+        """
+        if self.seekable is False:
+            for idx in indices:
+                self.pending[idx] = word
+            return
+        self.flush()
+        if self.binary is True:
+            width = 2
+            data = word.to_bytes(2, "little")
+        else:
+            width = (self.output_file.tell() - self.start) // self.written
+            data = Code.hack_lines[word]
+        for idx in indices:
+            self.output_file.seek(self.start + idx * width)
+            self.output_file.write(data)
+        self.output_file.seek(0, io.SEEK_END)
+
+    def flush(self) -> None:
+        """Writes all the pending instructions to the output file."""
+        if self.binary is True:
+            RomImage.write(self.pending, self.output_file)
+        else:
+            self.output_file.writelines(map(Code.hack_lines.__getitem__, self.pending))
+        self.written += len(self.pending)
+        del self.pending[:]
+
+    def close(self) -> None:
+        """Writes whatever is left. Does not close the output file."""
+        self.flush()
@@ -5,21 +5,36 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import contextlib
+import itertools
 import os
 import sys
 import typing
+from array import array
+from AssemblyCache import AssemblyCache
 from SymbolTable import SymbolTable
 from Parser import Parser
 from Code import Code
+from HackWriter import HackWriter
+from RomImage import RomImage
 
 
 def assemble_file(
-        input_file: typing.TextIO, output_file: typing.TextIO) -> None:
+        input_file: typing.TextIO, output_file: typing.IO,
+        binary: bool = False,
+        symbols_file: typing.Optional[typing.TextIO] = None) -> None:
     """Assembles a single file.
 
     Args:
         input_file (typing.TextIO): the file to assemble.
-        output_file (typing.TextIO): writes all output to this file.
+        output_file (typing.IO): writes all output to this file.
+        binary (bool): if this is True, output_file is opened in binary mode
+            and a ROM image is written to it instead of .hack text.
+        symbols_file (typing.Optional[typing.TextIO]): if given, the labels
+            and variables of the program are written to it, see
+            SymbolTable.export.
     """
     # Your code goes here!
     # A good place to start is to initialize a new Parser object:
@@ -29,69 +44,137 @@ def assemble_file(
     # initialization
     parser = Parser(input_file)
     symbol_table = SymbolTable()
+    writer = HackWriter(output_file, binary)
+    # ids of symbols that were used before they were defined, mapped to the
+    # indices of the placeholders that are waiting for their address. Symbols
+    # are kept in order of first appearance, which is the order variables get
+    # their RAM addresses in
+    forward_references = dict()
+    addresses = symbol_table.addresses
 
-    # first pass
-    while parser.has_more_commands() is True:
-        parser.advance()
-        type = parser.command_type()
-        if type == "L_COMMAND":
-            symbol_table.add_entry(parser.symbol(), parser.current_instruction_num)
-            parser.current_instruction_num -= 1
+    # single pass: every instruction is written as soon as it is read
+    for kind, word, symbol, address, line in parser.instructions():
+        if symbol is None:
+            writer.write(word)
+        elif kind == "A_COMMAND":
+            symbol_id = symbol_table.intern(symbol)
+            symbol_address = addresses[symbol_id]
+            if symbol_address is not None:
+                writer.write(symbol_address)
+            else:
+                indices = forward_references.get(symbol_id)
+                if indices is None:
+                    indices = forward_references[symbol_id] = array("L")
+                indices.append(address)
+                writer.write(0)
+        else:
+            symbol_table.add_entry(symbol, address)
 
-    # second pass
+    # backpatching: whatever was not defined as a label by now is a variable
     n = 16
-    parser.current_line = 0
-    parser.current_instruction = None
-    parser.current_instruction_num = -1
-    while parser.has_more_commands() is True:
-        parser.advance()
-        type = parser.command_type()
-        if type == "A_COMMAND":
-            if parser.symbol().isdigit() is True:
-                bits = a_instruction(parser.symbol())
-                output_file.write(bits + "\n")
-            elif symbol_table.contains(parser.symbol()) is True:
-                bits = a_instruction(symbol_table.get_address(parser.symbol()))
-                output_file.write(bits + "\n")
-            else:
-                symbol_table.add_entry(parser.symbol(), n)
-                bits = a_instruction(str(n))
-                output_file.write(bits + "\n")
-                n += 1
-        elif type == "C_COMMAND":
-            dest_bits = Code.dest(parser.dest())
-            jump_bits = Code.jump(parser.jump())
-            comp_string = parser.comp()
-            if ">>" in comp_string or "<<" in comp_string:
-                comp_bits = extended_c_instruction(comp_string)
-                output_file.write("101" + comp_bits + dest_bits + jump_bits + "\n")
+    for symbol_id, indices in forward_references.items():
+        address = addresses[symbol_id]
+        if address is None:
+            symbol_table.add_entry(symbol_table.names[symbol_id], n,
+                                   SymbolTable.VARIABLE)
+            address = n
+            n += 1
+        writer.patch(indices, address)
+    writer.close()
+    if symbols_file is not None:
+        symbol_table.export(symbols_file)
+
+
+def assemble_path(
+        input_path: str, binary: bool = False, symbols: bool = False,
+        cache_dir: typing.Optional[str] = None) -> typing.Optional[str]:
+    """Assembles the file at input_path into the .hack file (or ROM image) next
+    to it. The output is written to a temporary file which replaces the
+    previous output only once assembly succeeded, so a failed or interrupted
+    run never leaves a partial output behind.
+
+    Args:
+        input_path (str): the path of the .asm file.
+        binary (bool): if this is True, a ROM image is written instead of a
+            .hack file.
+        symbols (bool): if this is True, the symbols of the program are also
+            written to a .sym file next to it.
+        cache_dir (typing.Optional[str]): if given, the file is assembled
+            through the AssemblyCache in this directory.
+
+    Returns:
+        typing.Optional[str]: None if the file was assembled, otherwise a
+        description of the error.
+    """
+    filename, extension = os.path.splitext(input_path)
+    if binary is True:
+        output_path = filename + RomImage.extension
+        output_mode = 'wb'
+    else:
+        output_path = filename + ".hack"
+        output_mode = 'w'
+    outputs = [output_path]
+    if symbols is True:
+        outputs.append(filename + ".sym")
+    temp_paths = [path + "." + str(os.getpid()) + ".tmp" for path in outputs]
+    try:
+        with contextlib.ExitStack() as stack:
+            output_file = stack.enter_context(open(temp_paths[0], output_mode))
+            symbols_file = None
+            if symbols is True:
+                symbols_file = stack.enter_context(open(temp_paths[1], 'w'))
+            if cache_dir is None:
+                input_file = stack.enter_context(open(input_path, 'r'))
+                assemble_file(input_file, output_file, binary, symbols_file)
             else:
-                comp_bits = Code.comp(comp_string)
-                output_file.write("111" + comp_bits + dest_bits + jump_bits + "\n")
-
-
-def a_instruction(val: str) -> str:
-    binary = "0000000000000000"
-    if val == "0":
-        return binary
-    binary_lst = list(binary)
-    curr_val = int(val)
-    i = 14
-    while curr_val > 0:
-        if 2 ** i > curr_val:
-            i -= 1
-            continue
-        else:
-            binary_lst[15 - i] = "1"
-            curr_val -= 2 ** i
-            i -= 1
-    return ''.join(binary_lst)
+                words, symbol_table = AssemblyCache(cache_dir).assemble(input_path)
+                writer = HackWriter(output_file, binary)
+                writer.write_all(words)
+                writer.close()
+                if symbols_file is not None:
+                    symbol_table.export(symbols_file)
+        for temp_path, path in zip(temp_paths, outputs):
+            os.replace(temp_path, path)
+    except Exception as error:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return type(error).__name__ + ": " + str(error)
+    return None
 
 
-def extended_c_instruction(comp: str) -> str:
-    extended_c_dict = {"A<<": "0100000", "D<<": "0110000", "M<<": "1100000",
-                       "A>>": "0000000", 'D>>': "0010000", "M>>": "1000000"}
-    return extended_c_dict[comp]
+def assemble_paths(
+        input_paths: typing.List[str], binary: bool = False,
+        symbols: bool = False, cache_dir: typing.Optional[str] = None,
+        jobs: int = 1) -> typing.Dict[str, str]:
+    """Assembles every file in input_paths, see assemble_path. The files are
+    independent of each other, so with more than one job they are assembled
+    in parallel by a pool of processes.
+
+    Args:
+        input_paths (typing.List[str]): the paths of the .asm files.
+        binary (bool): if this is True, ROM images are written instead of
+            .hack files.
+        symbols (bool): if this is True, .sym files are written as well.
+        cache_dir (typing.Optional[str]): if given, the files are assembled
+            through the AssemblyCache in this directory.
+        jobs (int): the number of processes to use.
+
+    Returns:
+        typing.Dict[str, str]: the error of every file that failed, by path.
+    """
+    if jobs > 1 and len(input_paths) > 1:
+        chunk_size = max(1, len(input_paths) // (jobs * 4))
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            errors = list(executor.map(
+                assemble_path, input_paths, itertools.repeat(binary),
+                itertools.repeat(symbols), itertools.repeat(cache_dir),
+                chunksize=chunk_size))
+    else:
+        errors = [assemble_path(input_path, binary, symbols, cache_dir)
+                  for input_path in input_paths]
+    return {input_path: error for input_path, error in zip(input_paths, errors)
+            if error is not None}
 
 
 if "__main__" == __name__:
@@ -100,20 +183,39 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: Assembler <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="Assembler", description="Assembles Hack assembly files.")
+    arg_parser.add_argument("input_path", help="an .asm file or a directory")
+    arg_parser.add_argument(
+        "--binary", action="store_true",
+        help="write " + RomImage.extension + " ROM images instead of .hack text")
+    arg_parser.add_argument(
+        "--symbols", action="store_true",
+        help="also write the labels and variables of each file to a .sym file")
+    arg_parser.add_argument(
+        "--cache", metavar="DIR",
+        help="reuse the results of previous runs kept in DIR, reassembling "
+             "only what changed")
+    arg_parser.add_argument(
+        "--jobs", type=int, default=1, metavar="N",
+        help="assemble N files at a time, 0 for one per CPU (default: 1)")
+    args = arg_parser.parse_args()
+    if args.jobs < 0:
+        arg_parser.error("--jobs must be 0 or more")
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
         files_to_assemble = [
             os.path.join(argument_path, filename)
             for filename in os.listdir(argument_path)]
     else:
         files_to_assemble = [argument_path]
-    for input_path in files_to_assemble:
-        filename, extension = os.path.splitext(input_path)
-        if extension.lower() != ".asm":
-            continue
-        output_path = filename + ".hack"
-        with open(input_path, 'r') as input_file, \
-                open(output_path, 'w') as output_file:
-            assemble_file(input_file, output_file)
+    files_to_assemble = [
+        input_path for input_path in files_to_assemble
+        if os.path.splitext(input_path)[1].lower() == ".asm"]
+    errors = assemble_paths(
+        files_to_assemble, args.binary, args.symbols, args.cache,
+        args.jobs or os.cpu_count())
+    for input_path, error in errors.items():
+        print(input_path + ": " + error, file=sys.stderr)
+    if len(errors) > 0:
+        sys.exit(1)
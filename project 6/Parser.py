@@ -5,7 +5,10 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import re
 import typing
+from Code import Code
+from Command import Command
 
 
 class Parser:
@@ -15,6 +18,15 @@ class Parser:
     and symbols). In addition, removes all white space and comments.
     """
 
+    # a single line of assembly: the command without the whitespaces around it
+    # and the comment after it, empty for blank lines and comment-only lines.
+    # Lines which are not well formed are matched whole by the second group
+    line_pattern = re.compile(
+        r"[^\S\n]*([^\s/](?:[^\n/]*[^\s/])?)?[^\S\n]*(?://[^\n]*)?\n|([^\n]*)\n")
+
+    # number of characters read at a time by instructions()
+    chunk_size = 1 << 16
+
     def __init__(self, input_file: typing.TextIO) -> None:
         """Opens the input file and gets ready to parse it.
 
@@ -22,10 +34,14 @@ class Parser:
             input_file (typing.TextIO): input file.
         """
         # Your code goes here!
-        # A good place to start is to read all the lines of the input:
-        self.input_lines_array = input_file.read().splitlines()
-        self.current_line = 0
+        # the lines are read lazily, one at a time, so the input is never held
+        # in memory as a whole
+        self.input_file = input_file
+        self.input_lines = iter(input_file)
+        self.current_line = 0  # the number of lines read so far
         self.current_instruction = None
+        self.current_command = None
+        self.next_instruction = None
         self.current_instruction_num = -1  # counting only A and C instructions
 
     def has_more_commands(self) -> bool:
@@ -35,17 +51,21 @@ class Parser:
             bool: True if there are more commands, False otherwise.
         """
         # Your code goes here!
-        # checking that line is command
-        while self.current_line < len(self.input_lines_array):
-            line = self.input_lines_array[self.current_line].replace(" ", "").replace("\t",
-                                                                                      "")  # line has no whitespaces
-            if line.startswith("//") is True:
-                self.current_line += 1
-                continue
-            if line == "":
-                self.current_line += 1
+        # checking that line is command. The line is normalized here once, and
+        # advance() only has to take it
+        if self.next_instruction is not None:
+            return True
+        for instruction in self.input_lines:
+            self.current_line += 1
+            # removing comments from the end of instruction:
+            if "//" in instruction:
+                idx = instruction.index("//")
+                instruction = instruction[:idx]
+            # removing whitespaces, including the line break
+            instruction = "".join(instruction.split())
+            if instruction == "":
                 continue
-            self.current_instruction_num += 1
+            self.next_instruction = instruction
             return True
         return False
 
@@ -54,14 +74,127 @@ class Parser:
         Should be called only if has_more_commands() is true.
         """
         # Your code goes here!
-        instruction = self.input_lines_array[self.current_line]
-        # removing comments from the end of instruction:
-        if "//" in instruction:
-            idx = instruction.index("//")
-            instruction = instruction[:idx]
-        # removing whitespaces
-        self.current_instruction = instruction.replace(" ", "").replace("\t", "")
-        self.current_line += 1
+        instruction = self.next_instruction
+        self.current_instruction = instruction
+        self.next_instruction = None
+        # building the parsed form of the command, once
+        if instruction[0] == "@":
+            self.current_instruction_num += 1
+            symbol = instruction[1:]
+            if symbol.isdigit() is True:
+                self.current_command = Command(
+                    "A_COMMAND", int(symbol), None, self.current_instruction_num,
+                    self.current_line)
+            else:
+                self.current_command = Command(
+                    "A_COMMAND", 0, symbol, self.current_instruction_num,
+                    self.current_line)
+        elif instruction[0] == "(":
+            self.current_command = Command(
+                "L_COMMAND", 0, instruction[1:-1], self.current_instruction_num + 1,
+                self.current_line)
+        else:
+            self.current_instruction_num += 1
+            self.current_command = Command(
+                "C_COMMAND", self.encode_c_command(instruction), None,
+                self.current_instruction_num, self.current_line)
+
+    def commands(self) -> typing.Iterator[Command]:
+        """Parses the rest of the input, see instructions().
+
+        Returns:
+            typing.Iterator[Command]: the parsed commands, in order.
+        """
+        for fields in self.instructions():
+            yield Command(*fields)
+
+    def instructions(self) -> typing.Iterator[typing.Tuple[
+            str, int, typing.Optional[str], int, int]]:
+        """Parses the rest of the input in bulk: the input is read in large
+        chunks, and a single regular expression strips the comments and
+        whitespaces of all the lines in a chunk at once. This replaces calling
+        has_more_commands() and advance() for every line.
+
+        Returns:
+            typing.Iterator[typing.Tuple[str, int, typing.Optional[str], int,
+            int]]: a tuple for every command, in order, holding the fields of
+            its Command: kind, word, symbol, address and line.
+        """
+        if self.next_instruction is not None:
+            self.advance()
+            command = self.current_command
+            yield (command.kind, command.word, command.symbol, command.address,
+                   command.line)
+        # C-commands repeat a lot, so each one is encoded once
+        c_words = dict()
+        instruction_num = self.current_instruction_num
+        line = self.current_line
+        rest = ""
+        while rest is not None:
+            chunk = self.input_file.read(Parser.chunk_size)
+            if chunk == "":
+                # the last line may not end with a line break
+                chunk = rest + "\n" if rest != "" else ""
+                rest = None
+            else:
+                # only complete lines are parsed, the last one waits for the
+                # next chunk
+                chunk = rest + chunk
+                end = chunk.rfind("\n") + 1
+                chunk, rest = chunk[:end], chunk[end:]
+            for line, (instruction, invalid) in enumerate(
+                    Parser.line_pattern.findall(chunk), line + 1):
+                if instruction == "":
+                    if invalid != "":
+                        raise ValueError("line " + str(line)
+                                         + ": invalid instruction " + invalid)
+                    continue
+                if " " in instruction or "\t" in instruction:
+                    instruction = "".join(instruction.split())
+                first = instruction[0]
+                if first == "@":
+                    instruction_num += 1
+                    symbol = instruction[1:]
+                    if symbol.isdigit() is True:
+                        yield "A_COMMAND", int(symbol), None, instruction_num, line
+                    else:
+                        yield "A_COMMAND", 0, symbol, instruction_num, line
+                elif first == "(":
+                    if instruction[-1] != ")":
+                        raise ValueError("line " + str(line)
+                                         + ": invalid instruction " + instruction)
+                    yield "L_COMMAND", 0, instruction[1:-1], instruction_num + 1, line
+                else:
+                    instruction_num += 1
+                    word = c_words.get(instruction)
+                    if word is None:
+                        self.current_line = line
+                        self.current_instruction = instruction
+                        word = c_words[instruction] = self.encode_c_command(
+                            instruction)
+                    yield "C_COMMAND", word, None, instruction_num, line
+        self.current_instruction_num = instruction_num
+        self.current_line = line
+
+    def encode_c_command(self, instruction: str) -> int:
+        """
+        Args:
+            instruction (str): a C-command, without whitespaces and comments.
+
+        Returns:
+            int: the encoded instruction.
+        """
+        dest = "null"
+        if "=" in instruction:
+            dest, instruction = instruction.split("=", 1)
+        comp, _, jump = instruction.partition(";")
+        comp_bits = Code.comp(comp)
+        dest_bits = Code.dest(dest)
+        jump_bits = Code.jump(jump or "null")
+        if comp_bits is None or dest_bits is None or jump_bits is None:
+            raise ValueError("line " + str(self.current_line)
+                             + ": invalid instruction " + self.current_instruction)
+        return comp_bits | dest_bits | jump_bits
 
     def command_type(self) -> str:
         """
@@ -72,11 +205,7 @@ class Parser:
             "L_COMMAND" (actually, pseudo-command) for (Xxx) where Xxx is a symbol
         """
         # Your code goes here!
-        if self.current_instruction.startswith("@") is True:
-            return "A_COMMAND"
-        if self.current_instruction.startswith("(") is True:
-            return "L_COMMAND"
-        return "C_COMMAND"
+        return self.current_command.kind
 
     def symbol(self) -> str:
         """
@@ -0,0 +1,91 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import mmap
+import os
+import sys
+import typing
+from array import array
+
+
+class RomImage:
+    """Reads and writes assembled programs as ROM images. A ROM image holds
+    the instructions packed as little-endian 16-bit words, 2 bytes per
+    instruction instead of the 17 of a line in a .hack file, so it can be
+    loaded without parsing.
+    """
+
+    extension = ".rom"
+
+    @staticmethod
+    def write(words: typing.Iterable[int], output_file: typing.BinaryIO) -> None:
+        """Writes the given instructions as a ROM image.
+
+        Args:
+            words (typing.Iterable[int]): the instructions to write.
+            output_file (typing.BinaryIO): a file opened in binary mode.
+        """
+        rom = array("H", words)
+        if sys.byteorder == "big":
+            rom.byteswap()
+        rom.tofile(output_file)
+
+    @staticmethod
+    def load(path: str) -> array:
+        """Reads a ROM image into memory.
+
+        Args:
+            path (str): the path of the ROM image.
+
+        Returns:
+            array: the instructions, as an array of unsigned 16-bit words.
+        """
+        rom = array("H")
+        with open(path, "rb") as input_file:
+            data = input_file.read()
+        RomImage.check_size(path, len(data))
+        rom.frombytes(data)
+        if sys.byteorder == "big":
+            rom.byteswap()
+        return rom
+
+    @staticmethod
+    def map(path: str) -> typing.Sequence[int]:
+        """Memory-maps a ROM image, so its instructions can be read without
+        copying the file. The mapping stays open for as long as the returned
+        view is referenced.
+
+        Args:
+            path (str): the path of the ROM image.
+
+        Returns:
+            typing.Sequence[int]: a read-only view of the instructions. On
+            big-endian machines the words have to be swapped, so a loaded
+            array is returned instead.
+        """
+        if sys.byteorder == "big":
+            return RomImage.load(path)
+        with open(path, "rb") as input_file:
+            size = os.fstat(input_file.fileno()).st_size
+            RomImage.check_size(path, size)
+            if size == 0:
+                # an empty file can not be mapped
+                return memoryview(b"").cast("H")
+            rom = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(rom).cast("H")
+
+    @staticmethod
+    def check_size(path: str, size: int) -> None:
+        """Checks that a ROM image holds whole instructions.
+
+        Args:
+            path (str): the path of the ROM image.
+            size (int): the size of the image, in bytes.
+        """
+        if size % 2 != 0:
+            raise ValueError("%s: a ROM image holds 2 bytes per instruction, "
+                             "but it has %d bytes" % (path, size))
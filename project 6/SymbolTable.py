@@ -5,36 +5,74 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import typing
 
 
 class SymbolTable:
     """
     A symbol table that keeps a correspondence between symbolic labels and 
     numeric addresses.
+    Symbol names are interned to dense ids, in order of first appearance, and
+    the addresses are kept as ints in a list indexed by id, so resolving a
+    symbol takes a single lookup.
     """
 
+    # the kinds of symbols the table holds
+    PREDEFINED = "predefined"
+    LABEL = "label"
+    VARIABLE = "variable"
+
     def __init__(self) -> None:
         """Creates a new symbol table initialized with all the predefined symbols
         and their pre-allocated RAM addresses, according to section 6.2.3 of the
         book.
         """
         # Your code goes here!
-        self.symbols_dict = {"R0": "0", "R1": "1", "R2": "2", "R3": "3",
-                             "R4": "4", "R5": "5", "R6": "6", "R7": "7",
-                             "R8": "8", "R9": "9", "R10": "10", "R11": "11",
-                             "R12": "12", "R13": "13", "R14": "14", "R15": "15",
-                             "SCREEN": "16384", "KBD": "24576", "SP": "0", "LCL": "1",
-                             "ARG": "2", "THIS": "3", "THAT": "4"}
-
-    def add_entry(self, symbol: str, address: int) -> None:
+        self.symbols_dict = dict()  # symbol name -> id
+        self.names = []  # id -> symbol name
+        self.addresses = []  # id -> address, None while it is not known
+        self.kinds = []  # id -> kind of the symbol, None while it is not known
+        predefined = {"R0": 0, "R1": 1, "R2": 2, "R3": 3,
+                      "R4": 4, "R5": 5, "R6": 6, "R7": 7,
+                      "R8": 8, "R9": 9, "R10": 10, "R11": 11,
+                      "R12": 12, "R13": 13, "R14": 14, "R15": 15,
+                      "SCREEN": 16384, "KBD": 24576, "SP": 0, "LCL": 1,
+                      "ARG": 2, "THIS": 3, "THAT": 4}
+        for symbol, address in predefined.items():
+            self.add_entry(symbol, address, SymbolTable.PREDEFINED)
+
+    def intern(self, symbol: str) -> int:
+        """Returns the id of the symbol, giving it a new one if it is seen for
+        the first time. A new symbol has no address yet.
+
+        Args:
+            symbol (str): a symbol.
+
+        Returns:
+            int: the id of the symbol.
+        """
+        symbol_id = self.symbols_dict.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.names)
+            self.symbols_dict[symbol] = symbol_id
+            self.names.append(symbol)
+            self.addresses.append(None)
+            self.kinds.append(None)
+        return symbol_id
+
+    def add_entry(self, symbol: str, address: int, kind: str = LABEL) -> None:
         """Adds the pair (symbol, address) to the table.
 
         Args:
             symbol (str): the symbol to add.
             address (int): the address corresponding to the symbol.
+            kind (str): SymbolTable.LABEL, SymbolTable.VARIABLE or
+                SymbolTable.PREDEFINED.
         """
         # Your code goes here!
-        self.symbols_dict[symbol] = str(address)
+        symbol_id = self.intern(symbol)
+        self.addresses[symbol_id] = address
+        self.kinds[symbol_id] = kind
 
     def contains(self, symbol: str) -> bool:
         """Does the symbol table contain the given symbol?
@@ -46,19 +84,32 @@ class SymbolTable:
             bool: True if the symbol is contained, False otherwise.
         """
         # Your code goes here!
-        if self.symbols_dict.get(symbol) is not None:
-            return True
-        else:
-            return False
+        return self.get_address(symbol) is not None
 
-    def get_address(self, symbol: str) -> int:
+    def get_address(self, symbol: str) -> typing.Optional[int]:
         """Returns the address associated with the symbol.
 
         Args:
             symbol (str): a symbol.
 
         Returns:
-            int: the address associated with the symbol.
+            typing.Optional[int]: the address associated with the symbol, None
+            if the table does not contain it.
         """
         # Your code goes here!
-        return self.symbols_dict.get(symbol)
+        symbol_id = self.symbols_dict.get(symbol)
+        if symbol_id is None:
+            return None
+        return self.addresses[symbol_id]
+
+    def export(self, output_file: typing.TextIO) -> None:
+        """Writes the labels and variables of the program, one per line, as
+        "<name> <address> <kind>", in order of first appearance. Debuggers can
+        read this back to show symbolic names.
+
+        Args:
+            output_file (typing.TextIO): writes the symbols to this file.
+        """
+        for name, address, kind in zip(self.names, self.addresses, self.kinds):
+            if kind == SymbolTable.LABEL or kind == SymbolTable.VARIABLE:
+                output_file.write(name + " " + str(address) + " " + kind + "\n")
@@ -0,0 +1,51 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import unittest
+from BatchEmulator import BatchEmulator, np
+from Emulator import Emulator
+
+# @0, A=M, M=1, (END), @END, 0;JMP: sets the word RAM[0] points to
+POINTER_PROGRAM = [0, 0xFC20, 0xEFC8, 3, 0xEA87]
+
+
+@unittest.skipIf(np is None, "BatchEmulator requires numpy")
+class BatchEmulatorTest(unittest.TestCase):
+    """Compares the lanes of a BatchEmulator with Emulator."""
+
+    def test_out_of_range_faults_lane(self) -> None:
+        batch = BatchEmulator(POINTER_PROGRAM, 2)
+        batch.poke(0, [5, 40000])
+        batch.run(100)
+        self.assertEqual([True, False], batch.halted.tolist())
+        self.assertEqual([False, True], batch.faulted.tolist())
+        self.assertEqual(1, batch.peek(5)[0])
+        emulator = Emulator(POINTER_PROGRAM)
+        emulator.poke(0, 40000)
+        with self.assertRaises(ValueError):
+            emulator.run(100)
+        self.assertEqual(emulator.pc, batch.pc[1])
+        self.assertEqual(emulator.a, batch.a[1])
+        self.assertEqual(emulator.cycles, batch.cycles[1])
+
+    def test_invalid_instruction_before_any_lane(self) -> None:
+        # @0, D=M, @6, D;JNE, @9, 0, and a word that is not an instruction:
+        # the lanes split at address 3
+        rom = [0, 0xFC10, 6, 0xE305, 9, 0, 0x8000]
+        batch = BatchEmulator(rom, 2)
+        batch.poke(0, [0, 1])
+        self.assertEqual(4, batch.run(4))
+        with self.assertRaises(ValueError):
+            batch.run(1)
+        # the lane at the valid instruction did not run it either
+        self.assertEqual([4, 6], batch.pc.tolist())
+        self.assertEqual([4, 4], batch.cycles.tolist())
+        self.assertEqual(6, batch.a[0])
+
+
+if "__main__" == __name__:
+    unittest.main()
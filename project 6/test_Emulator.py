@@ -0,0 +1,32 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import unittest
+from Emulator import Emulator
+
+# @5, D=A, @0, M=D, (END), @END, 0;JMP
+HALTING_PROGRAM = [5, 0xEC10, 0, 0xE308, 4, 0xEA87]
+
+
+class EmulatorTest(unittest.TestCase):
+    """Compares running compiled blocks with running one instruction at a
+    time."""
+
+    def test_halt_at_cycle_limits(self) -> None:
+        interpreter = Emulator(HALTING_PROGRAM)
+        self.assertEqual(Emulator.HALTED, interpreter.run(1000))
+        # the limits around Emulator.block_size, where the blocks stop
+        for cycles in range(Emulator.block_size - 2, Emulator.block_size + 6):
+            emulator = Emulator(HALTING_PROGRAM, jit=True)
+            self.assertEqual(Emulator.HALTED, emulator.run(cycles), cycles)
+            self.assertEqual(interpreter.pc, emulator.pc, cycles)
+            self.assertEqual(interpreter.cycles, emulator.cycles, cycles)
+            self.assertEqual(5, emulator.peek(0), cycles)
+
+
+if "__main__" == __name__:
+    unittest.main()
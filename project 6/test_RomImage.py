@@ -0,0 +1,32 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import tempfile
+import unittest
+from RomImage import RomImage
+
+
+class RomImageTest(unittest.TestCase):
+    """Reads ROM images written by RomImage.write."""
+
+    def test_odd_length(self) -> None:
+        # load and map report an image with half an instruction the same way
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "Odd" + RomImage.extension)
+            with open(path, "wb") as output_file:
+                RomImage.write([1, 2], output_file)
+                output_file.write(b"\0")
+            with self.assertRaises(ValueError) as load_error:
+                RomImage.load(path)
+            with self.assertRaises(ValueError) as map_error:
+                RomImage.map(path)
+        self.assertEqual(str(load_error.exception), str(map_error.exception))
+
+
+if "__main__" == __name__:
+    unittest.main()
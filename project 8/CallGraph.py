@@ -0,0 +1,88 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, FUNCTION, CALL
+
+
+class CallGraph:
+    """The functions of a whole VM program, and the functions each of them
+    calls.
+
+    The VM language has no function pointers, so every function a program
+    can run is reached by call commands from the function the bootstrap code
+    calls, and the other functions can be dropped from the program.
+    """
+
+    def __init__(self) -> None:
+        """Creates an empty call graph, files are added by add_file."""
+        # the decoded commands of every function, by name, from its function
+        # command to the next one, see Parser.decode
+        self.commands = {}
+        # the name of the file every function is in
+        self.files = {}
+        # the functions every function calls
+        self.calls = {}
+        # the functions that are called from outside of any function
+        self.roots = set()
+
+    def add_file(self, parser: Parser, filename: str) -> None:
+        """Adds the functions of a file.
+
+        Args:
+            parser (Parser): a parser of the file, that decoded it.
+            filename (str): the name of the file, without its extension.
+        """
+        commands = None
+        calls = self.roots
+        for command in zip(parser.opcodes, parser.segments, parser.arguments,
+                           parser.names):
+            opcode, segment, argument, name = command
+            if opcode == FUNCTION:
+                commands = self.commands[name] = []
+                calls = self.calls[name] = set()
+                self.files[name] = filename
+            elif opcode == CALL:
+                calls.add(name)
+            if commands is not None:
+                commands.append(command)
+
+    def reachable(self, root: str) -> typing.Set[str]:
+        """
+        Args:
+            root (str): the function the program starts from.
+
+        Returns:
+            typing.Set[str]: the functions that are defined in the program and
+            can be called, directly or not, from the root or from outside of
+            any function.
+        """
+        reached = set()
+        pending = [root] + list(self.roots)
+        while len(pending) > 0:
+            function = pending.pop()
+            if function in reached or function not in self.calls:
+                continue
+            reached.add(function)
+            pending.extend(self.calls[function])
+        return reached
+
+    def dead_functions(self, root: str) -> typing.List[str]:
+        """
+        Args:
+            root (str): the function the program starts from.
+
+        Returns:
+            typing.List[str]: the functions that can not be called, see
+            reachable, in the order they were added. If the root is not
+            defined, where the program starts is not known, and no function
+            is returned.
+        """
+        if root not in self.calls:
+            return []
+        reached = self.reachable(root)
+        return [function for function in self.calls if function not in reached]
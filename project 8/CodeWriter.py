@@ -6,26 +6,64 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from OutputBuffer import OutputBuffer
 
 
 class CodeWriter:
     """Translates VM commands into Hack assembly code."""
 
-    def __init__(self, output_stream: typing.TextIO) -> None:
+    # the average number of instructions that each translation of a
+    # comparison runs, over its true and false results and the sign
+    # combinations of its operands, not counting spilling a cached top
+    comparison_costs = {
+        "eq": 16, "gt": 37, "lt": 37, "constant": 16, "zero": 14,
+        "$$EQ": 20, "$$GT": 26, "$$LT": 26,
+    }
+
+    def __init__(self, output_stream: typing.TextIO, cache_top: bool = False,
+                 shared_calls: bool = False,
+                 shared_comparisons: bool = False, comments: bool = True) -> None:
         """Initializes the CodeWriter.
 
         Args:
             output_stream (typing.TextIO): output stream.
+            cache_top (bool): if this is True, the top of the stack is kept in
+                D between commands whenever possible, instead of in RAM.
+            shared_calls (bool): if this is True, calls and returns jump to
+                the $$CALL and $$RETURN routines that the bootstrap code
+                writes, instead of saving and restoring frames inline.
+            shared_comparisons (bool): if this is True, eq, gt and lt jump to
+                the $$EQ, $$GT and $$LT routines that the bootstrap code
+                writes, which takes fewer instructions but more cycles than
+                comparing inline.
+            comments (bool): if this is False, the VM commands are not written
+                as comments before their translations.
         """
         # Your code goes here!
         # Note that you can write to output_stream like so:
         # output_stream.write("Hello world! \n")
-        self.os = output_stream
+        # the output is written when flush is called
+        self.os = OutputBuffer(output_stream)
+        self.comments = comments
         self.label_idx = 1
         self.filename = None
         self.funcname = ""
         self.ret_idx = 1
         self.segments_dict = {"local": "LCL", "argument": "ARG", "this": "THIS", "that": "THAT"}
+        # when caching the top of the stack, top_in_d is True while the top
+        # is only in D. SP then points to where the top would be in RAM, so
+        # it must be spilled before anything else uses D or the stack
+        self.cache_top = cache_top
+        self.top_in_d = False
+        self.shared_calls = shared_calls
+        self.shared_comparisons = shared_comparisons
+        # the estimated number of cycles it takes to run every comparison
+        # that was written once, see CodeWriter.comparison_costs
+        self.comparison_cycles = 0
+        # the values of the words the last commands pushed, from the bottom
+        # to the top of the stack, or None for values that are not known
+        # constants. This is cleared where control may come from elsewhere
+        self.stack_constants = []
 
     def set_file_name(self, filename: str) -> None:
         """Informs the code writer that the translation of a new VM file is
@@ -46,6 +84,13 @@ class CodeWriter:
         # For example, using code similar to:
         # input_filename, input_extension = os.path.splitext(os.path.basename(input_file.name))
         self.filename = filename
+        self.stack_constants = []
+
+    def flush(self) -> None:
+        """Writes the translations that were written so far to the output
+        stream. This must be called after translating a file.
+        """
+        self.os.flush()
 
     def write_arithmetic(self, command: str) -> None:
         """Writes assembly code that is the translation of the given
@@ -59,7 +104,8 @@ class CodeWriter:
         # Your code goes here!
 
         # writing the command in the output file with "//"
-        self.os.write("// " + command + "\n")
+        if self.comments is True:
+            self.os.write("// " + command + "\n")
         if command == "add":
             self.binary_operation("D+M")
         elif command == "sub":
@@ -76,12 +122,35 @@ class CodeWriter:
             self.unary_operation("M<<")
         elif command == "shiftright":
             self.unary_operation("M>>")
+        elif self.shared_comparisons is True and command in ("eq", "gt", "lt"):
+            self.shared_comparison("$$" + command.upper())
         elif command == "eq":
+            self.spill_top()
             self.eq_operation()
-        elif command == "gt":
-            self.gt_lt_operation("JGT")
-        elif command == "lt":
-            self.gt_lt_operation("JLT")
+            self.comparison_cycles += CodeWriter.comparison_costs["eq"]
+        elif command in ("gt", "lt"):
+            compare_str = "JGT" if command == "gt" else "JLT"
+            # y is the top of the stack, and x is below it
+            y = self.stack_constants[-1] if len(self.stack_constants) > 0 else None
+            x = self.stack_constants[-2] if len(self.stack_constants) > 1 else None
+            if y is not None:
+                self.constant_comparison(compare_str, y, False)
+            elif x is not None:
+                # x < y is y > x
+                self.constant_comparison(
+                    "JLT" if command == "gt" else "JGT", x, True)
+            else:
+                self.spill_top()
+                self.gt_lt_operation(compare_str)
+                self.comparison_cycles += CodeWriter.comparison_costs[command]
+
+        if command == "neg":
+            if len(self.stack_constants) > 0 and self.stack_constants[-1] is not None:
+                self.stack_constants[-1] = -self.stack_constants[-1]
+        elif command in ("not", "shiftleft", "shiftright"):
+            self.stack_constants[-1:] = [None]
+        else:
+            self.stack_constants[-2:] = [None]
 
     def write_push_pop(self, command: str, segment: str, index: int) -> None:
         """Writes assembly code that is the translation of the given
@@ -99,7 +168,8 @@ class CodeWriter:
         # variables to the RAM, starting at address 16.
 
         # writing the command in the output file with "//"
-        self.os.write("// " + command + " " + segment + " " + str(index) + "\n")
+        if self.comments is True:
+            self.os.write("// " + command + " " + segment + " " + str(index) + "\n")
         if segment == "constant":
             # only push is possible
             self.push_const(index)
@@ -124,6 +194,13 @@ class CodeWriter:
             elif command == "pop":
                 self.pop_static(str(index))
 
+        if command == "pop":
+            del self.stack_constants[-1:]
+        elif segment == "constant":
+            self.stack_constants.append(index)
+        else:
+            self.stack_constants.append(None)
+
     def write_label(self, label: str) -> None:
         """Writes assembly code that affects the label command.
         Let "Xxx.foo" be a function within the file Xxx.vm. The handling of
@@ -135,7 +212,10 @@ class CodeWriter:
         Args:
             label (str): the label to write.
         """
-        self.os.write("// label " + label + "\n")
+        if self.comments is True:
+            self.os.write("// label " + label + "\n")
+        self.stack_constants = []
+        self.spill_top()
         self.os.write("(" + self.funcname + "$" + label + ")" + "\n")
 
     def write_goto(self, label: str) -> None:
@@ -144,7 +224,10 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.os.write("// goto " + label + "\n")
+        if self.comments is True:
+            self.os.write("// goto " + label + "\n")
+        self.stack_constants = []
+        self.spill_top()
         self.os.write("@" + self.funcname + "$" + label + "\n")
         self.os.write("0;JMP" + "\n")
 
@@ -154,10 +237,14 @@ class CodeWriter:
         Args:
             label (str): the label to go to.
         """
-        self.os.write("// if-goto " + label + "\n")
-        self.decrement_SP()
-        self.os.write("A=M" + "\n")
-        self.os.write("D=M" + "\n")
+        if self.comments is True:
+            self.os.write("// if-goto " + label + "\n")
+        self.stack_constants = []
+        if self.top_in_d is False:
+            self.decrement_SP()
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
+        self.top_in_d = False
         self.os.write("@" + self.funcname + "$" + label + "\n")
         self.os.write("D;JNE" + "\n")
 
@@ -179,10 +266,15 @@ class CodeWriter:
         # (function_name)       // injects a function entry label into the code
         # repeat n_vars times:  // n_vars = number of local variables
         #   push constant 0     // initializes the local variables to 0
-        self.os.write("// function " + function_name + " " + str(n_vars) + "\n")
+        if self.comments is True:
+            self.os.write("// function " + function_name + " " + str(n_vars) + "\n")
+        self.stack_constants = []
+        self.spill_top()
         self.os.write("(" + function_name + ")" + "\n")
         for i in range(n_vars):
             self.push_const(0)
+        # the local segment is read from RAM
+        self.spill_top()
         self.funcname = function_name
 
     def write_call(self, function_name: str, n_args: int) -> None:
@@ -214,10 +306,16 @@ class CodeWriter:
         # goto function_name    // transfers control to the callee
         # (return_address)      // injects the return address label into the code
 
-        self.os.write("// call " + function_name + " " + str(n_args) + "\n")
+        if self.comments is True:
+            self.os.write("// call " + function_name + " " + str(n_args) + "\n")
+        self.stack_constants = []
+        self.spill_top()
 
         # push return_address
         return_address = self.filename + "." + function_name + "$ret." + str(self.ret_idx)
+        if self.shared_calls is True:
+            self.shared_call(function_name, n_args, return_address)
+            return
         self.os.write("@" + return_address + "\n")
         self.os.write("D=A" + "\n")
         self.os.write("@SP" + "\n")
@@ -274,7 +372,27 @@ class CodeWriter:
         # LCL = *(frame-4)              // restores LCL for the caller
         # goto return_address           // go to the return address
 
-        self.os.write("// return" + "\n")
+        if self.comments is True:
+            self.os.write("// return" + "\n")
+        self.stack_constants = []
+        if self.shared_calls is True:
+            # goto $$RETURN
+            self.spill_top()
+            self.os.write("@$$RETURN" + "\n")
+            self.os.write("0;JMP" + "\n")
+            return
+        self.return_frame()
+
+    # helper functions:
+
+    def return_frame(self) -> None:
+        # a cached return value is kept in R15, since D is needed before it
+        # can be moved to *ARG
+        return_value_in_d = self.top_in_d
+        if return_value_in_d is True:
+            self.os.write("@R15" + "\n")
+            self.os.write("M=D" + "\n")
+            self.top_in_d = False
 
         # frame = LCL. frame will be stored at R13
         self.os.write("@LCL" + "\n")
@@ -292,9 +410,13 @@ class CodeWriter:
         self.os.write("M=D" + "\n")
 
         # *ARG = pop()
-        self.decrement_SP()
-        self.os.write("A=M" + "\n")
-        self.os.write("D=M" + "\n")
+        if return_value_in_d is True:
+            self.os.write("@R15" + "\n")
+            self.os.write("D=M" + "\n")
+        else:
+            self.decrement_SP()
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
         self.os.write("@ARG" + "\n")
         self.os.write("A=M" + "\n")
         self.os.write("M=D" + "\n")
@@ -326,8 +448,6 @@ class CodeWriter:
         self.os.write("A=M" + "\n")
         self.os.write("0;JMP" + "\n")
 
-    # helper functions:
-
     def bootstrap_func(self) -> None:
         # sp = 256
         self.os.write("@256" + "\n")
@@ -338,6 +458,194 @@ class CodeWriter:
         # call sys.init
         self.write_call("Sys.init", 0)
 
+        if self.shared_calls is True:
+            self.write_shared_routines()
+        if self.shared_comparisons is True:
+            self.write_shared_comparisons()
+
+    def write_shared_comparisons(self) -> None:
+        # $$EQ, $$GT and $$LT replace x and y on the stack with x == y,
+        # x > y and x < y, and return to the address in D
+        if self.comments is True:
+            self.os.write("// $$EQ" + "\n")
+        self.os.write("($$EQ)" + "\n")
+        self.os.write("@R15" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # SP--, D = x - y, A = SP-1
+        self.os.write("@SP" + "\n")
+        self.os.write("AM=M-1" + "\n")
+        self.os.write("D=M" + "\n")
+        self.os.write("A=A-1" + "\n")
+        self.os.write("D=M-D" + "\n")
+
+        # *(SP-1) = -1, if D != 0 *(SP-1) = 0
+        self.os.write("M=-1" + "\n")
+        self.os.write("@$$EQ_END" + "\n")
+        self.os.write("D;JEQ" + "\n")
+        self.os.write("@SP" + "\n")
+        self.os.write("A=M-1" + "\n")
+        self.os.write("M=0" + "\n")
+        self.os.write("($$EQ_END)" + "\n")
+        self.os.write("@R15" + "\n")
+        self.os.write("A=M" + "\n")
+        self.os.write("0;JMP" + "\n")
+
+        for name, compare_str in (("$$GT", "JGT"), ("$$LT", "JLT")):
+            if self.comments is True:
+                self.os.write("// " + name + "\n")
+            self.os.write("(" + name + ")" + "\n")
+            self.os.write("@R15" + "\n")
+            self.os.write("M=D" + "\n")
+
+            # SP--, D = y
+            self.os.write("@SP" + "\n")
+            self.os.write("AM=M-1" + "\n")
+            self.os.write("D=M" + "\n")
+            self.os.write("@" + name + "_Y_NEGATIVE" + "\n")
+            self.os.write("D;JLT" + "\n")
+
+            # y >= 0, so x < 0 is less than y, and otherwise x-y can not
+            # overflow
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M-1" + "\n")
+            self.os.write("D=M" + "\n")
+            decided = "_FALSE" if compare_str == "JGT" else "_TRUE"
+            self.os.write("@" + name + decided + "\n")
+            self.os.write("D;JLT" + "\n")
+            self.os.write("@" + name + "_SUBTRACT" + "\n")
+            self.os.write("0;JMP" + "\n")
+
+            # y < 0, so x >= 0 is greater than y, and otherwise x-y can not
+            # overflow
+            self.os.write("(" + name + "_Y_NEGATIVE)" + "\n")
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M-1" + "\n")
+            self.os.write("D=M" + "\n")
+            decided = "_TRUE" if compare_str == "JGT" else "_FALSE"
+            self.os.write("@" + name + decided + "\n")
+            self.os.write("D;JGE" + "\n")
+
+            # D = x-y, if D > 0 (gt) or D < 0 (lt) goto TRUE
+            self.os.write("(" + name + "_SUBTRACT)" + "\n")
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
+            self.os.write("A=A-1" + "\n")
+            self.os.write("D=M-D" + "\n")
+            self.os.write("@" + name + "_TRUE" + "\n")
+            self.os.write(f"D;{compare_str}" + "\n")
+
+            # *(SP-1) = 0 or -1, and goto D
+            self.os.write("(" + name + "_FALSE)" + "\n")
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M-1" + "\n")
+            self.os.write("M=0" + "\n")
+            self.os.write("@R15" + "\n")
+            self.os.write("A=M" + "\n")
+            self.os.write("0;JMP" + "\n")
+            self.os.write("(" + name + "_TRUE)" + "\n")
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M-1" + "\n")
+            self.os.write("M=-1" + "\n")
+            self.os.write("@R15" + "\n")
+            self.os.write("A=M" + "\n")
+            self.os.write("0;JMP" + "\n")
+
+    def shared_comparison(self, routine: str) -> None:
+        self.spill_top()
+
+        # D = RETURN_i, goto routine
+        return_label = self.unique_label("RETURN")
+        self.os.write("@" + return_label + "\n")
+        self.os.write("D=A" + "\n")
+        self.os.write("@" + routine + "\n")
+        self.os.write("0;JMP" + "\n")
+        self.os.write("(" + return_label + ")" + "\n")
+        self.label_idx += 1
+        self.comparison_cycles += CodeWriter.comparison_costs[routine]
+
+    def shared_call(self, function_name: str, n_args: int, return_address: str) -> None:
+        self.ret_idx += 1
+
+        # R15 = return_address
+        self.os.write("@" + return_address + "\n")
+        self.os.write("D=A" + "\n")
+        self.os.write("@R15" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # R13 = function_name
+        self.os.write("@" + function_name + "\n")
+        self.os.write("D=A" + "\n")
+        self.os.write("@R13" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # D = n_args, which $$CALL moves to R14
+        self.os.write("@" + str(n_args) + "\n")
+        self.os.write("D=A" + "\n")
+
+        # goto $$CALL
+        self.os.write("@$$CALL" + "\n")
+        self.os.write("0;JMP" + "\n")
+
+        # (return_address)
+        self.os.write("(" + return_address + ")" + "\n")
+
+    def write_shared_routines(self) -> None:
+        # $$CALL does what write_call does inline, for function R13 that
+        # returns to R15 and is called with D arguments
+        if self.comments is True:
+            self.os.write("// $$CALL" + "\n")
+        self.os.write("($$CALL)" + "\n")
+        self.os.write("@R14" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # push return_address, LCL, ARG, THIS, THAT
+        self.os.write("@R15" + "\n")
+        self.os.write("D=M" + "\n")
+        for seg in [None] + list(self.segments_dict):
+            if seg is not None:
+                self.os.write("@" + self.segments_dict[seg] + "\n")
+                self.os.write("D=M" + "\n")
+            self.os.write("@SP" + "\n")
+            self.os.write("AM=M+1" + "\n")
+            self.os.write("A=A-1" + "\n")
+            self.os.write("M=D" + "\n")
+
+        # ARG = SP-5-R14
+        self.os.write("@R14" + "\n")
+        self.os.write("D=M" + "\n")
+        self.os.write("@5" + "\n")
+        self.os.write("D=D+A" + "\n")
+        self.os.write("@SP" + "\n")
+        self.os.write("D=M-D" + "\n")
+        self.os.write("@ARG" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # LCL = SP
+        self.os.write("@SP" + "\n")
+        self.os.write("D=M" + "\n")
+        self.os.write("@LCL" + "\n")
+        self.os.write("M=D" + "\n")
+
+        # goto R13
+        self.os.write("@R13" + "\n")
+        self.os.write("A=M" + "\n")
+        self.os.write("0;JMP" + "\n")
+
+        # $$RETURN does what write_return does inline
+        if self.comments is True:
+            self.os.write("// $$RETURN" + "\n")
+        self.os.write("($$RETURN)" + "\n")
+        self.return_frame()
+
+    def unique_label(self, name: str) -> str:
+        # the labels of one command are told apart from those of other
+        # commands by label_idx, and from those of other files by the file
+        # name, so that files can be translated separately. Function labels
+        # are "Xxx.foo$bar", and no function is named only "Xxx"
+        return self.filename + "$" + name + "_" + str(self.label_idx)
+
     def decrement_SP(self) -> None:
         self.os.write("@SP" + "\n")
         self.os.write("M=M-1" + "\n")
@@ -346,10 +654,24 @@ class CodeWriter:
         self.os.write("@SP" + "\n")
         self.os.write("M=M+1" + "\n")
 
-    def push_const(self, index: int) -> None:
-        # D=index
-        self.os.write("@" + str(index) + "\n")
-        self.os.write("D=A" + "\n")
+    def spill_top(self) -> None:
+        """Writes the top of the stack from D to RAM, if it is cached there.
+        This must be called before the stack is used by code that does not
+        know about the cache, like the code after the last command.
+        """
+        if self.top_in_d is True:
+            # SP++, *(SP-1) = D
+            self.os.write("@SP" + "\n")
+            self.os.write("AM=M+1" + "\n")
+            self.os.write("A=A-1" + "\n")
+            self.os.write("M=D" + "\n")
+            self.top_in_d = False
+
+    def push_d(self) -> None:
+        if self.cache_top is True:
+            # the value is already where the top is cached
+            self.top_in_d = True
+            return
 
         # *SP=D
         self.os.write("@SP" + "\n")
@@ -359,7 +681,30 @@ class CodeWriter:
         # SP++
         self.increment_SP()
 
+    def push_const(self, index: int) -> None:
+        self.spill_top()
+
+        # D=index
+        self.os.write("@" + str(index) + "\n")
+        self.os.write("D=A" + "\n")
+
+        self.push_d()
+
     def binary_operation(self, binary_str) -> None:
+        if self.cache_top is True:
+            # D = y, unless it is already there
+            if self.top_in_d is False:
+                self.decrement_SP()
+                self.os.write("A=M" + "\n")
+                self.os.write("D=M" + "\n")
+
+            # SP--, D = x op y, which is the new top
+            self.os.write("@SP" + "\n")
+            self.os.write("AM=M-1" + "\n")
+            self.os.write(f"D={binary_str}" + "\n")
+            self.top_in_d = True
+            return
+
         # SP--
         self.decrement_SP()
 
@@ -376,6 +721,10 @@ class CodeWriter:
         self.os.write(f"M={binary_str}" + "\n")
 
     def unary_operation(self, unary_str) -> None:
+        if self.top_in_d is True:
+            self.os.write("D=" + unary_str.replace("M", "D") + "\n")
+            return
+
         # case neg: *SP-1 = -*SP-1
         # case not: *SP-1 = !*SP-1
         # case shiftleft: *SP-1 = *SP-1<<
@@ -392,23 +741,24 @@ class CodeWriter:
         self.os.write("A=M" + "\n")
         self.os.write("D=M" + "\n")
 
-        # if D>0 goto POSITIVE_Y
-        self.os.write("@POSITIVE_Y_" + str(self.label_idx) + "\n")
-        self.os.write("D;JGT" + "\n")
+        # if D>=0 goto POSITIVE_Y, so that subtracting values of the
+        # same sign can not overflow
+        self.os.write("@" + self.unique_label("POSITIVE_Y") + "\n")
+        self.os.write("D;JGE" + "\n")
 
-        # y <= 0, set R14 to zero
+        # y < 0, set R14 to zero
         self.os.write("@R14" + "\n")
         self.os.write("M=0" + "\n")
-        self.os.write("@X_CHECK_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("X_CHECK") + "\n")
         self.os.write("0;JMP" + "\n")
 
-        # y is positive, set R14 to 1
-        self.os.write("(POSITIVE_Y_" + str(self.label_idx) + ")" + "\n")
+        # y >= 0, set R14 to 1
+        self.os.write("(" + self.unique_label("POSITIVE_Y") + ")" + "\n")
         self.os.write("@R14" + "\n")
         self.os.write("M=1" + "\n")
 
         # checking sign of x
-        self.os.write("(X_CHECK_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("X_CHECK") + ")" + "\n")
 
         # SP--
         self.decrement_SP()
@@ -417,22 +767,23 @@ class CodeWriter:
         self.os.write("A=M" + "\n")
         self.os.write("D=M" + "\n")
 
-        # if D>0 goto POSITIVE_X
-        self.os.write("@POSITIVE_X_" + str(self.label_idx) + "\n")
-        self.os.write("D;JGT" + "\n")
+        # if D>=0 goto POSITIVE_X, so that subtracting values of the
+        # same sign can not overflow
+        self.os.write("@" + self.unique_label("POSITIVE_X") + "\n")
+        self.os.write("D;JGE" + "\n")
 
-        # x <= 0, set R13 to zero
+        # x < 0, set R13 to zero
         self.os.write("@R13" + "\n")
         self.os.write("M=0" + "\n")
-        self.os.write("@END_SIGN_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("END_SIGN") + "\n")
         self.os.write("0;JMP" + "\n")
 
-        # x is positive, set R13 to 1
-        self.os.write("(POSITIVE_X_" + str(self.label_idx) + ")" + "\n")
+        # x >= 0, set R13 to 1
+        self.os.write("(" + self.unique_label("POSITIVE_X") + ")" + "\n")
         self.os.write("@R13" + "\n")
         self.os.write("M=1" + "\n")
 
-        self.os.write("(END_SIGN_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("END_SIGN") + ")" + "\n")
 
     def not_same_gt(self) -> None:
         # D = R13-1
@@ -445,7 +796,7 @@ class CodeWriter:
         self.os.write("M=-1" + "\n")
 
         # if D = 0 goto IS_GRATER
-        self.os.write("@IS_GRATER_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("IS_GRATER") + "\n")
         self.os.write("D;JEQ" + "\n")
 
         # x is smaller, *SP=0
@@ -453,7 +804,7 @@ class CodeWriter:
         self.os.write("A=M" + "\n")
         self.os.write("M=0" + "\n")
 
-        self.os.write("(IS_GRATER_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("IS_GRATER") + ")" + "\n")
         self.increment_SP()
 
         # self.true_label_idx += 1
@@ -469,7 +820,7 @@ class CodeWriter:
         self.os.write("M=0" + "\n")
 
         # if D = 0 goto IS_GRATER
-        self.os.write("@IS_GRATER_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("IS_GRATER") + "\n")
         self.os.write("D;JEQ" + "\n")
 
         # x is smaller, *SP = -1
@@ -477,7 +828,7 @@ class CodeWriter:
         self.os.write("A=M" + "\n")
         self.os.write("M=-1" + "\n")
 
-        self.os.write("(IS_GRATER_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("IS_GRATER") + ")" + "\n")
         self.increment_SP()
 
     def gt_lt_operation(self, compare_str) -> None:
@@ -488,21 +839,21 @@ class CodeWriter:
         self.os.write("D=M" + "\n")
         self.os.write("@R14" + "\n")
         self.os.write("D=D-M" + "\n")
-        self.os.write("@SAME_SIGN_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("SAME_SIGN") + "\n")
         self.os.write("D;JEQ" + "\n")
 
         # X and y are not the same sign
         if compare_str == "JLT":
             self.not_same_lt()
-            self.os.write("@END_" + str(self.label_idx) + "\n")
+            self.os.write("@" + self.unique_label("END") + "\n")
             self.os.write("0;JMP" + "\n")
         elif compare_str == "JGT":
             self.not_same_gt()
-            self.os.write("@END_" + str(self.label_idx) + "\n")
+            self.os.write("@" + self.unique_label("END") + "\n")
             self.os.write("0;JMP" + "\n")
 
         # in case of same sign, no danger of overflow
-        self.os.write("(SAME_SIGN_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("SAME_SIGN") + ")" + "\n")
 
         # D = x-y (SP now points to x)
         self.os.write("@SP" + "\n")
@@ -519,7 +870,7 @@ class CodeWriter:
 
         # case gt: if D > 0 goto TRUE_i
         # case lt: if D < 0 goto TRUE_i
-        self.os.write("@TRUE_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("TRUE") + "\n")
         self.os.write(f"D;{compare_str}" + "\n")
 
         # *SP = 0
@@ -528,13 +879,73 @@ class CodeWriter:
         self.os.write("M=0" + "\n")
 
         # (TRUE_i)
-        self.os.write("(TRUE_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("TRUE") + ")" + "\n")
         # sp++
         self.increment_SP()
 
-        self.os.write("(END_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("END") + ")" + "\n")
         self.label_idx += 1
 
+    def constant_comparison(self, compare_str: str, constant: int, swapped: bool) -> None:
+        # compares the top of the stack with a constant that was pushed above
+        # it, or below it if swapped is True. When their signs differ the
+        # sign of the other value decides, and otherwise subtracting them can
+        # not overflow
+        if swapped is False:
+            # SP--, dropping the constant y, unless it is only cached in D
+            if self.top_in_d is False:
+                self.decrement_SP()
+
+            # SP--, D = x
+            self.os.write("@SP" + "\n")
+            self.os.write("AM=M-1" + "\n")
+            self.os.write("D=M" + "\n")
+        else:
+            # SP--, D = y, unless it is already there
+            if self.top_in_d is False:
+                self.os.write("@SP" + "\n")
+                self.os.write("AM=M-1" + "\n")
+                self.os.write("D=M" + "\n")
+
+            # SP--, dropping the constant x
+            self.decrement_SP()
+        self.top_in_d = False
+
+        true_label = self.unique_label("TRUE")
+        false_label = self.unique_label("FALSE")
+        if constant != 0:
+            if constant > 0:
+                # a negative value is less than the constant
+                decided_label = true_label if compare_str == "JLT" else false_label
+                self.os.write("@" + decided_label + "\n")
+                self.os.write("D;JLT" + "\n")
+                self.os.write("@" + str(constant) + "\n")
+                self.os.write("D=D-A" + "\n")
+            else:
+                # a value that is not negative is greater than the constant
+                decided_label = true_label if compare_str == "JGT" else false_label
+                self.os.write("@" + decided_label + "\n")
+                self.os.write("D;JGE" + "\n")
+                self.os.write("@" + str(-constant) + "\n")
+                self.os.write("D=D+A" + "\n")
+
+        # D = value-constant, if D > 0 (gt) or D < 0 (lt) goto TRUE_i
+        self.os.write("@" + true_label + "\n")
+        self.os.write(f"D;{compare_str}" + "\n")
+        if constant != 0 and decided_label == false_label:
+            self.os.write("(" + false_label + ")" + "\n")
+        self.os.write("D=0" + "\n")
+        self.os.write("@" + self.unique_label("END") + "\n")
+        self.os.write("0;JMP" + "\n")
+        self.os.write("(" + true_label + ")" + "\n")
+        self.os.write("D=-1" + "\n")
+        self.os.write("(" + self.unique_label("END") + ")" + "\n")
+        self.label_idx += 1
+        self.comparison_cycles += CodeWriter.comparison_costs[
+            "constant" if constant != 0 else "zero"]
+
+        self.push_d()
+
     def eq_operation(self) -> None:
         # SP--
         self.decrement_SP()
@@ -556,7 +967,7 @@ class CodeWriter:
         # case eq: if D == 0 goto TRUE_i
         # case gt: if D > 0 goto TRUE_i
         # case lt: if D < 0 goto TRUE_i
-        self.os.write("@TRUE_" + str(self.label_idx) + "\n")
+        self.os.write("@" + self.unique_label("TRUE") + "\n")
         self.os.write(f"D;JEQ" + "\n")
 
         # *SP = 0
@@ -565,7 +976,7 @@ class CodeWriter:
         self.os.write("M=0" + "\n")
 
         # (TRUE_i)
-        self.os.write("(TRUE_" + str(self.label_idx) + ")" + "\n")
+        self.os.write("(" + self.unique_label("TRUE") + ")" + "\n")
 
         # sp++
         self.increment_SP()
@@ -573,6 +984,8 @@ class CodeWriter:
         self.label_idx += 1
 
     def push_segment_i(self, pointer_name: str, i: str) -> None:
+        self.spill_top()
+
         # D = i
         self.os.write("@" + i + "\n")
         self.os.write("D=A" + "\n")
@@ -587,15 +1000,31 @@ class CodeWriter:
         # D = *pointer_name+i
         self.os.write("D=M" + "\n")
 
-        # *SP = D
-        self.os.write("@SP" + "\n")
-        self.os.write("A=M" + "\n")
-        self.os.write("M=D" + "\n")
-
-        # SP++
-        self.increment_SP()
+        self.push_d()
 
     def pop_segment_i(self, pointer_name: str, i: str) -> None:
+        value_in_r15 = False
+        if self.top_in_d is True:
+            self.top_in_d = False
+            if pointer_name == "5":
+                # temp i = D
+                self.os.write("@" + str(5 + int(i)) + "\n")
+                self.os.write("M=D" + "\n")
+                return
+            if int(i) < 10:
+                # A = pointer_name+i, counting up from the base, is shorter
+                # than computing it in R13 without losing D
+                self.os.write("@" + pointer_name + "\n")
+                self.os.write("A=M" + "\n")
+                for _ in range(int(i)):
+                    self.os.write("A=A+1" + "\n")
+                self.os.write("M=D" + "\n")
+                return
+            # R15 = D, and R13 = pointer_name+i below
+            self.os.write("@R15" + "\n")
+            self.os.write("M=D" + "\n")
+            value_in_r15 = True
+
         # D = i
         self.os.write("@" + i + "\n")
         self.os.write("D=A" + "\n")
@@ -611,12 +1040,17 @@ class CodeWriter:
         self.os.write("@R13" + "\n")
         self.os.write("M=D" + "\n")
 
-        # SP--
-        self.decrement_SP()
+        if value_in_r15 is True:
+            # D = R15, the value that was cached
+            self.os.write("@R15" + "\n")
+            self.os.write("D=M" + "\n")
+        else:
+            # SP--
+            self.decrement_SP()
 
-        # D = *SP
-        self.os.write("A=M" + "\n")
-        self.os.write("D=M" + "\n")
+            # D = *SP
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
 
         # *R13
         self.os.write("@R13" + "\n")
@@ -629,17 +1063,13 @@ class CodeWriter:
         else:
             pointer_name = "THAT"
 
+        self.spill_top()
+
         # D = pointer_name
         self.os.write("@" + pointer_name + "\n")
         self.os.write("D=M" + "\n")
 
-        # *SP = D
-        self.os.write("@SP" + "\n")
-        self.os.write("A=M" + "\n")
-        self.os.write("M=D" + "\n")
-
-        # SP++
-        self.increment_SP()
+        self.push_d()
 
     def pop_pointer(self, i: str) -> None:
         if i == "0":
@@ -647,39 +1077,39 @@ class CodeWriter:
         else:
             pointer_name = "THAT"
 
-        # SP--
-        self.decrement_SP()
+        if self.top_in_d is False:
+            # SP--
+            self.decrement_SP()
 
-        # D = *SP
-        self.os.write("@SP" + "\n")
-        self.os.write("A=M" + "\n")
-        self.os.write("D=M" + "\n")
+            # D = *SP
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
+        self.top_in_d = False
 
         # pointer_name = D
         self.os.write("@" + pointer_name + "\n")
         self.os.write("M=D" + "\n")
 
     def push_static(self, i: str) -> None:
+        self.spill_top()
+
         # D = filename.i
         self.os.write("@" + self.filename + "." + i + "\n")
         self.os.write("D=M" + "\n")
 
-        # *SP = D
-        self.os.write("@SP" + "\n")
-        self.os.write("A=M" + "\n")
-        self.os.write("M=D" + "\n")
-
-        # sp++
-        self.increment_SP()
+        self.push_d()
 
     def pop_static(self, i: str) -> None:
-        # SP--
-        self.decrement_SP()
+        if self.top_in_d is False:
+            # SP--
+            self.decrement_SP()
 
-        # D = *SP
-        self.os.write("@SP" + "\n")
-        self.os.write("A=M" + "\n")
-        self.os.write("D=M" + "\n")
+            # D = *SP
+            self.os.write("@SP" + "\n")
+            self.os.write("A=M" + "\n")
+            self.os.write("D=M" + "\n")
+        self.top_in_d = False
 
         # filename.i = D
         self.os.write("@" + self.filename + "." + i + "\n")
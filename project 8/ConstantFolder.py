@@ -0,0 +1,225 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, ARITHMETIC, PUSH, CALL
+
+CONSTANT = Parser.segment_ids["constant"]
+(ADD, SUB, NEG, EQ, GT, LT, AND, OR, NOT, SHIFTLEFT, SHIFTRIGHT) = (
+    Parser.arithmetic_ids[command] for command in Parser.arithmetic_commands)
+
+
+class ConstantFolder:
+    """Simplifies the decoded commands of a VM file before they are
+    translated:
+    - operations on constants are replaced by their results, like
+      "push constant 1, neg, neg" by "push constant 1".
+    - operations that do not change their operand are removed, like
+      "push constant 0, add".
+    - multiplying by a power of two is replaced by shifting left, and
+      multiplying or dividing by 0, 1 or -1 by cheaper commands. These assume
+      Math.multiply and Math.divide are those of the Jack OS.
+
+    A value is a known constant if it is pushed by "push constant c",
+    optionally followed by neg or not. Only consecutive commands are
+    combined, so a label between them keeps them apart.
+    """
+
+    # the results of the operations, on signed 16-bit values
+    unary_operations = {
+        NEG: lambda x: -x,
+        NOT: lambda x: ~x,
+        SHIFTLEFT: lambda x: x << 1,
+        # shiftright keeps the sign bit
+        SHIFTRIGHT: lambda x: x >> 1,
+    }
+    binary_operations = {
+        ADD: lambda x, y: x + y,
+        SUB: lambda x, y: x - y,
+        AND: lambda x, y: x & y,
+        OR: lambda x, y: x | y,
+        EQ: lambda x, y: -1 if x == y else 0,
+        GT: lambda x, y: -1 if x > y else 0,
+        LT: lambda x, y: -1 if x < y else 0,
+    }
+    # operations whose operands can be swapped
+    commutative = {ADD, AND, OR, EQ, "Math.multiply"}
+
+    @staticmethod
+    def fold(parser: Parser) -> None:
+        """Simplifies the decoded commands of a parser.
+
+        Args:
+            parser (Parser): a parser that decoded its file.
+        """
+        commands = []
+        for command in zip(parser.opcodes, parser.segments, parser.arguments,
+                           parser.names):
+            ConstantFolder.add(commands, command)
+        parser.replace_commands(commands)
+
+    @staticmethod
+    def to_signed(value: int) -> int:
+        """
+        Args:
+            value (int): an integer.
+
+        Returns:
+            int: the signed 16-bit word the integer is stored as.
+        """
+        value &= 0xFFFF
+        return value - 0x10000 if value & 0x8000 else value
+
+    @staticmethod
+    def constant(commands: typing.List[typing.Tuple[int, int, int, str]],
+                 end: int) -> typing.Optional[typing.Tuple[int, int]]:
+        """
+        Args:
+            commands (typing.List[typing.Tuple[int, int, int, str]]): the
+                simplified commands, see Parser.decode.
+            end (int): the index after the commands that push the value.
+
+        Returns:
+            typing.Optional[typing.Tuple[int, int]]: the value and the index
+            of the first command that pushes it, if it is a known constant.
+        """
+        if end < 1:
+            return None
+        opcode, segment, argument, name = commands[end - 1]
+        if opcode == PUSH and segment == CONSTANT:
+            return ConstantFolder.to_signed(argument), end - 1
+        if opcode == ARITHMETIC and segment in (NEG, NOT) and end >= 2:
+            opcode, pushed_segment, argument, name = commands[end - 2]
+            if opcode == PUSH and pushed_segment == CONSTANT:
+                return ConstantFolder.to_signed(
+                    ConstantFolder.unary_operations[segment](argument)), end - 2
+        return None
+
+    @staticmethod
+    def push_constant(commands: typing.List[typing.Tuple[int, int, int, str]],
+                      value: int) -> None:
+        """Adds the commands that push a constant, where push constant only
+        takes values from 0 to 32767.
+
+        Args:
+            commands (typing.List[typing.Tuple[int, int, int, str]]): the
+                simplified commands, see Parser.decode.
+            value (int): a signed 16-bit value.
+        """
+        if value >= 0:
+            commands.append((PUSH, CONSTANT, value, ""))
+        else:
+            commands.append((PUSH, CONSTANT, ~value, ""))
+            commands.append((ARITHMETIC, NOT, 0, ""))
+
+    @staticmethod
+    def add(commands: typing.List[typing.Tuple[int, int, int, str]],
+            command: typing.Tuple[int, int, int, str]) -> None:
+        """Adds a command after the simplified commands, and simplifies it
+        with the commands before it.
+
+        Args:
+            commands (typing.List[typing.Tuple[int, int, int, str]]): the
+                simplified commands, see Parser.decode.
+            command (typing.Tuple[int, int, int, str]): the command to add.
+        """
+        opcode, segment, argument, name = command
+        if opcode == ARITHMETIC:
+            operation = segment
+        elif opcode == CALL and argument == 2 and name in (
+                "Math.multiply", "Math.divide"):
+            operation = name
+        else:
+            commands.append(command)
+            return
+        if operation in ConstantFolder.unary_operations:
+            folded = ConstantFolder.constant(commands, len(commands))
+            if folded is not None:
+                value, start = folded
+                value = ConstantFolder.to_signed(
+                    ConstantFolder.unary_operations[operation](value))
+                # "push constant 1, neg" would only become
+                # "push constant 0, not"
+                if len(commands) - start + 1 > (1 if value >= 0 else 2):
+                    del commands[start:]
+                    ConstantFolder.push_constant(commands, value)
+                    return
+            elif (operation in (NEG, NOT) and len(commands) > 0
+                  and commands[-1] == command):
+                # neg and not undo themselves
+                del commands[-1]
+                return
+            commands.append(command)
+            return
+        y = ConstantFolder.constant(commands, len(commands))
+        if (y is None and operation in ConstantFolder.commutative
+                and len(commands) > 0 and commands[-1][0] == PUSH):
+            # with a constant x, "push constant x, push local 0, add" is
+            # simplified like "push local 0, push constant x, add"
+            x = ConstantFolder.constant(commands, len(commands) - 1)
+            if x is not None:
+                commands[x[1]:] = [commands[-1]] + commands[x[1]:-1]
+                y = ConstantFolder.constant(commands, len(commands))
+        if y is None:
+            if (operation == SUB and len(commands) > 0
+                    and commands[-1][0] == PUSH):
+                # 0 - x is -x
+                x = ConstantFolder.constant(commands, len(commands) - 1)
+                if x is not None and x[0] == 0:
+                    del commands[x[1]:-1]
+                    ConstantFolder.add(commands, (ARITHMETIC, NEG, 0, ""))
+                    return
+            commands.append(command)
+            return
+        y, y_start = y
+        x = ConstantFolder.constant(commands, y_start)
+        if x is not None:
+            x, x_start = x
+            if operation in ConstantFolder.binary_operations:
+                value = ConstantFolder.binary_operations[operation](x, y)
+            elif operation == "Math.multiply":
+                value = x * y
+            elif y != 0:
+                # Math.divide rounds towards zero
+                value = abs(x) // abs(y)
+                value = value if (x < 0) == (y < 0) else -value
+            else:
+                # dividing by zero is an error at runtime
+                commands.append(command)
+                return
+            del commands[x_start:]
+            ConstantFolder.push_constant(commands, ConstantFolder.to_signed(value))
+            return
+        # the commands that replace "push constant y" and the operation
+        replacement = None
+        if operation in (ADD, SUB, OR) and y == 0:
+            replacement = []
+        elif operation == AND and y == -1:
+            replacement = []
+        elif operation == AND and y == 0 and y_start > 0 \
+                and commands[y_start - 1][0] == PUSH:
+            # x is pushed by a single command, which can be dropped
+            del commands[y_start - 1:]
+            ConstantFolder.push_constant(commands, 0)
+            return
+        elif operation in ("Math.multiply", "Math.divide") and y == 1:
+            replacement = []
+        elif operation in ("Math.multiply", "Math.divide") and y == -1:
+            replacement = [(ARITHMETIC, NEG, 0, "")]
+        elif operation == "Math.multiply" and y == 0:
+            replacement = [(PUSH, CONSTANT, 0, ""), (ARITHMETIC, AND, 0, "")]
+        elif operation == "Math.multiply" and y > 0 and y & (y - 1) == 0:
+            # shifting left is multiplying by 2, also when x is negative.
+            # Dividing is not replaced by shifting right, which rounds
+            # negative values down instead of towards zero
+            replacement = [(ARITHMETIC, SHIFTLEFT, 0, "")] * (y.bit_length() - 1)
+        if replacement is None:
+            commands.append(command)
+            return
+        del commands[y_start:]
+        for replacing in replacement:
+            ConstantFolder.add(commands, replacing)
@@ -0,0 +1,224 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+from Parser import Parser, ARITHMETIC, PUSH, POP, FUNCTION, RETURN, CALL
+from CallGraph import CallGraph
+
+CONSTANT = Parser.segment_ids["constant"]
+LOCAL = Parser.segment_ids["local"]
+ARGUMENT = Parser.segment_ids["argument"]
+POINTER = Parser.segment_ids["pointer"]
+TEMP = Parser.segment_ids["temp"]
+STATIC = Parser.segment_ids["static"]
+# the arithmetic commands that take one value from the stack
+UNARY = {Parser.arithmetic_ids[command]
+         for command in ("neg", "not", "shiftleft", "shiftright")}
+# the number of words in the temp segment
+TEMP_SIZE = 8
+
+
+class Inliner:
+    """Replaces calls to small functions with the commands of the functions,
+    which saves saving and restoring a frame.
+
+    A function is inlined if it has at most threshold VM commands, calls no
+    other function, so it is not recursive either, has no labels, and ends
+    with its only return, when its working stack holds just the return
+    value. The call pops the arguments into the temp segment, and the local
+    variables and the pointers the function sets are kept there too, so the
+    function's commands use temp instead of argument and local, and the
+    pointers are restored after them. Only temp words that neither the
+    function nor its caller uses are taken for this, so the values the
+    caller keeps in temp across the call are not changed, and a call is not
+    inlined if there are not enough of them.
+
+    A function that uses the static segment is only inlined into functions
+    of its own file, since static refers to the variables of the file the
+    command is in. Calls outside of any function are not inlined, so every
+    call that is inlined is one of the sites plan found.
+    """
+
+    def __init__(self, threshold: int) -> None:
+        """Creates an inliner, that finds the functions to inline in plan.
+
+        Args:
+            threshold (int): the most VM commands a function that is inlined
+                has, including its function and return commands.
+        """
+        self.threshold = threshold
+        # the commands of every function that can be inlined, without its
+        # function and return commands, see Parser.decode
+        self.bodies = {}
+        # the number of local variables of every function that can be inlined
+        self.local_counts = {}
+        # the file of every function that can be inlined and uses the static
+        # segment, or None if it does not use it
+        self.static_files = {}
+        # the temp words every function of the program uses
+        self.temp_words = {}
+        # the calls that are inlined in the functions of the program: the
+        # caller, its file, the function that is inlined and the number of
+        # arguments
+        self.sites = []
+
+    def plan(self, call_graph: CallGraph) -> None:
+        """Finds the functions to inline, and the calls to them in the
+        program, which are removed from the call graph.
+
+        Args:
+            call_graph (CallGraph): the call graph of the whole program.
+        """
+        for function, commands in call_graph.commands.items():
+            if (len(commands) <= self.threshold
+                    and len(call_graph.calls[function]) == 0
+                    and commands[-1][0] == RETURN
+                    and Inliner.returns_one_value(commands[1:-1])):
+                self.bodies[function] = commands[1:-1]
+                self.local_counts[function] = commands[0][2]
+                uses_static = any(opcode in (PUSH, POP) and segment == STATIC
+                                  for opcode, segment, argument, name
+                                  in commands[1:-1])
+                self.static_files[function] = (
+                    call_graph.files[function] if uses_static else None)
+        for caller, commands in call_graph.commands.items():
+            self.temp_words[caller] = frozenset(
+                argument for opcode, segment, argument, name in commands
+                if opcode in (PUSH, POP) and segment == TEMP)
+        for caller, commands in call_graph.commands.items():
+            calls = set()
+            for opcode, segment, argument, name in commands:
+                if opcode != CALL:
+                    continue
+                if self.expansion(name, argument, call_graph.files[caller],
+                                  self.temp_words[caller]) is None:
+                    calls.add(name)
+                else:
+                    self.sites.append(
+                        (caller, call_graph.files[caller], name, argument))
+            call_graph.calls[caller] = calls
+
+    @staticmethod
+    def returns_one_value(
+            body: typing.List[typing.Tuple[int, int, int, str]]) -> bool:
+        """
+        Args:
+            body (typing.List[typing.Tuple[int, int, int, str]]): the commands
+                of a function, between its function and return commands.
+
+        Returns:
+            bool: True if the commands only push, pop and compute, never pop
+            a value they did not push, and leave one value on the stack.
+        """
+        depth = 0
+        for opcode, segment, argument, name in body:
+            if opcode == PUSH:
+                depth += 1
+            elif opcode == POP and depth >= 1:
+                depth -= 1
+            elif opcode == ARITHMETIC and segment in UNARY and depth >= 1:
+                pass
+            elif opcode == ARITHMETIC and segment not in UNARY and depth >= 2:
+                depth -= 1
+            else:
+                return False
+        return depth == 1
+
+    def expansion(
+            self, function: str, n_args: int, filename: str,
+            kept: typing.AbstractSet[int] = frozenset()
+    ) -> typing.Optional[typing.List[typing.Tuple[int, int, int, str]]]:
+        """
+        Args:
+            function (str): the function that is called.
+            n_args (int): the number of arguments of the call.
+            filename (str): the file the call is in.
+            kept (typing.AbstractSet[int]): the temp words the caller uses,
+                which the commands that replace the call must not change.
+
+        Returns:
+            typing.Optional[typing.List[typing.Tuple[int, int, int, str]]]:
+            the commands that replace the call, or None if it can not be
+            inlined.
+        """
+        body = self.bodies.get(function)
+        if body is None:
+            return None
+        if self.static_files[function] not in (None, filename):
+            return None
+        n_locals = self.local_counts[function]
+        used = set()
+        pointers = set()
+        for opcode, segment, argument, name in body:
+            if opcode not in (PUSH, POP):
+                continue
+            if segment == TEMP:
+                used.add(argument)
+            elif segment == ARGUMENT and argument >= n_args:
+                return None
+            elif segment == LOCAL and argument >= n_locals:
+                return None
+            elif segment == POINTER and opcode == POP:
+                pointers.add(argument)
+        pointers = sorted(pointers)
+        free = [slot for slot in range(TEMP_SIZE - 1, -1, -1)
+                if slot not in used and slot not in kept]
+        if n_args + n_locals + len(pointers) > len(free):
+            return None
+        slots = {ARGUMENT: free[:n_args],
+                 LOCAL: free[n_args:n_args + n_locals]}
+        pointer_slots = free[n_args + n_locals:]
+        commands = [(POP, TEMP, slot, "") for slot in reversed(slots[ARGUMENT])]
+        for i, slot in enumerate(slots[LOCAL]):
+            # local variables start as 0, which only matters if they are read
+            # before they are set
+            first = next((opcode for opcode, segment, argument, name in body
+                          if opcode in (PUSH, POP) and segment == LOCAL
+                          and argument == i), None)
+            if first == PUSH:
+                commands.append((PUSH, CONSTANT, 0, ""))
+                commands.append((POP, TEMP, slot, ""))
+        for pointer, slot in zip(pointers, pointer_slots):
+            commands.append((PUSH, POINTER, pointer, ""))
+            commands.append((POP, TEMP, slot, ""))
+        for opcode, segment, argument, name in body:
+            if opcode in (PUSH, POP) and segment in slots:
+                commands.append((opcode, TEMP, slots[segment][argument], name))
+            else:
+                commands.append((opcode, segment, argument, name))
+        for pointer, slot in zip(pointers, pointer_slots):
+            commands.append((PUSH, TEMP, slot, ""))
+            commands.append((POP, POINTER, pointer, ""))
+        return commands
+
+    def inline(self, parser: Parser, filename: str) -> None:
+        """Replaces the calls to functions that can be inlined in the
+        functions of the decoded commands of a parser.
+
+        Args:
+            parser (Parser): a parser that decoded its file.
+            filename (str): the name of the file, without its extension.
+        """
+        commands = []
+        inlined = False
+        caller = None
+        for command in zip(parser.opcodes, parser.segments, parser.arguments,
+                           parser.names):
+            opcode, segment, argument, name = command
+            expansion = None
+            if opcode == FUNCTION:
+                caller = name
+            elif opcode == CALL and caller in self.temp_words:
+                expansion = self.expansion(name, argument, filename,
+                                           self.temp_words[caller])
+            if expansion is None:
+                commands.append(command)
+            else:
+                commands.extend(expansion)
+                inlined = True
+        if inlined is True:
+            parser.replace_commands(commands)
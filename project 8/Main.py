@@ -5,52 +5,509 @@ was written by Aviv Yaish. It is an extension to the specifications given
 as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import itertools
 import os
 import sys
 import typing
-from Parser import Parser
+from Parser import Parser, FUNCTION, RETURN, CALL
+from CallGraph import CallGraph
 from CodeWriter import CodeWriter
+from ConstantFolder import ConstantFolder
+from Inliner import Inliner
+from PeepholeOptimizer import PeepholeOptimizer
+
+# translate_file's jump table: for every type of decoded command, in the
+# order of Parser.command_types, a function that writes a command given its
+# segment, argument and name, see Parser.decode
+command_writers = (
+    # C_ARITHMETIC
+    lambda code_writer, segment, argument, name: code_writer.write_arithmetic(
+        Parser.arithmetic_commands[segment]),
+    # C_PUSH
+    lambda code_writer, segment, argument, name: code_writer.write_push_pop(
+        "push", Parser.segment_names[segment], argument),
+    # C_POP
+    lambda code_writer, segment, argument, name: code_writer.write_push_pop(
+        "pop", Parser.segment_names[segment], argument),
+    # C_LABEL
+    lambda code_writer, segment, argument, name: code_writer.write_label(name),
+    # C_GOTO
+    lambda code_writer, segment, argument, name: code_writer.write_goto(name),
+    # C_IF
+    lambda code_writer, segment, argument, name: code_writer.write_if(name),
+    # C_FUNCTION
+    lambda code_writer, segment, argument, name: code_writer.write_function(
+        name, argument),
+    # C_RETURN
+    lambda code_writer, segment, argument, name: code_writer.write_return(),
+    # C_CALL
+    lambda code_writer, segment, argument, name: code_writer.write_call(
+        name, argument),
+)
+
+# the function the bootstrap code calls, see CodeWriter.bootstrap_func
+entry_function = "Sys.init"
+
+
+def write_commands(
+        code_writer: CodeWriter,
+        commands: typing.Iterable[typing.Tuple[int, int, int, str]]) -> None:
+    """Writes the translations of decoded commands.
+
+    Args:
+        code_writer (CodeWriter): writes the translations.
+        commands (typing.Iterable[typing.Tuple[int, int, int, str]]): the
+            opcode, segment, argument and name of every command, see
+            Parser.decode.
+    """
+    for opcode, segment, argument, name in commands:
+        command_writers[opcode](code_writer, segment, argument, name)
+
+
+def write_bootstrap(
+        output_file: typing.TextIO, cache_top: bool = False,
+        shared_calls: bool = False, shared_comparisons: bool = False,
+        comments: bool = True) -> None:
+    """Writes the bootstrap code, that calls Sys.init, and the shared
+    routines the other options need.
+
+    Args:
+        output_file (typing.TextIO): writes all output to this file.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+        comments (bool): see translate_file.
+    """
+    code_writer = CodeWriter(
+        output_file, cache_top, shared_calls, shared_comparisons, comments)
+    # the labels of the bootstrap code are named like those of a file, by a
+    # name that no VM file can have
+    code_writer.set_file_name("$$BOOT")
+    code_writer.bootstrap_func()
+    code_writer.flush()
 
 
 def translate_file(
         input_file: typing.TextIO, output_file: typing.TextIO,
-        bootstrap: bool) -> None:
+        bootstrap: bool, cache_top: bool = False,
+        shared_calls: bool = False, shared_comparisons: bool = False,
+        comments: bool = True,
+        dead_functions: typing.AbstractSet[str] = frozenset(),
+        fold_constants: bool = False,
+        inliner: typing.Optional[Inliner] = None) -> int:
     """Translates a single file.
 
     Args:
         input_file (typing.TextIO): the file to translate.
         output_file (typing.TextIO): writes all output to this file.
         bootstrap (bool): if this is True, the current file is the
-            first file we are translating.
+            first file we are translating, and the bootstrap code is written
+            before it.
+        cache_top (bool): if this is True, the top of the stack is kept in
+            D between commands, see CodeWriter.
+        shared_calls (bool): if this is True, calls and returns use the
+            routines that the bootstrap code writes, see CodeWriter.
+        shared_comparisons (bool): if this is True, comparisons use the
+            routines that the bootstrap code writes, see CodeWriter.
+        comments (bool): if this is False, the VM commands are not written
+            as comments.
+        dead_functions (typing.AbstractSet[str]): functions that are not
+            translated, since the program never calls them.
+        fold_constants (bool): if this is True, the commands are simplified
+            by a ConstantFolder before they are translated.
+        inliner (typing.Optional[Inliner]): if given, the calls it planned
+            to inline are inlined.
+
+    Returns:
+        int: the estimated number of cycles it takes to run every comparison
+        in the file once, see CodeWriter.comparison_costs.
     """
     # Your code goes here!
-    parser = Parser(input_file)
-    code_writer = CodeWriter(output_file)
     input_filename, input_extension = os.path.splitext(os.path.basename(input_file.name))
-    code_writer.set_file_name(input_filename)
+    parser = decode_file(input_file, dead_functions, fold_constants, inliner)
     if bootstrap is True:
-        code_writer.bootstrap_func()
-    while parser.has_more_commands() is True:
-        parser.advance()
-        command_type = parser.command_type()
-        if command_type == "C_ARITHMETIC":
-            code_writer.write_arithmetic(parser.current_instruction)
-        elif command_type == "C_PUSH":
-            code_writer.write_push_pop("push", parser.arg1(), parser.arg2())
-        elif command_type == "C_POP":
-            code_writer.write_push_pop("pop", parser.arg1(), parser.arg2())
-        elif command_type == "C_LABEL":
-            code_writer.write_label(parser.arg1())
-        elif command_type == "C_GOTO":
-            code_writer.write_goto(parser.arg1())
-        elif command_type == "C_IF":
-            code_writer.write_if(parser.arg1())
-        elif command_type == "C_FUNCTION":
-            code_writer.write_function(parser.arg1(), parser.arg2())
-        elif command_type == "C_CALL":
-            code_writer.write_call(parser.arg1(), parser.arg2())
-        elif command_type == "C_RETURN":
-            code_writer.write_return()
+        write_bootstrap(
+            output_file, cache_top, shared_calls, shared_comparisons, comments)
+    return write_file(parser, input_filename, output_file, cache_top,
+                      shared_calls, shared_comparisons, comments)
+
+
+def decode_file(
+        input_file: typing.TextIO,
+        dead_functions: typing.AbstractSet[str] = frozenset(),
+        fold_constants: bool = False,
+        inliner: typing.Optional[Inliner] = None) -> Parser:
+    """Decodes a file, and prepares its commands for translating.
+
+    Args:
+        input_file (typing.TextIO): the file to decode.
+        dead_functions (typing.AbstractSet[str]): see translate_file.
+        fold_constants (bool): see translate_file.
+        inliner (typing.Optional[Inliner]): see translate_file.
+
+    Returns:
+        Parser: a parser holding the decoded commands, see Parser.decode.
+    """
+    input_filename, input_extension = os.path.splitext(os.path.basename(input_file.name))
+    parser = Parser(input_file)
+    parser.decode()
+    if len(dead_functions) > 0:
+        parser.remove_functions(dead_functions)
+    if fold_constants is True:
+        ConstantFolder.fold(parser)
+    if inliner is not None:
+        inliner.inline(parser, input_filename)
+        if fold_constants is True:
+            # inlined functions may be called with constant arguments
+            ConstantFolder.fold(parser)
+    return parser
+
+
+def write_file(
+        parser: Parser, filename: str, output_file: typing.TextIO,
+        cache_top: bool = False, shared_calls: bool = False,
+        shared_comparisons: bool = False, comments: bool = True) -> int:
+    """Writes the translation of a decoded file, without the bootstrap code.
+
+    Args:
+        parser (Parser): a parser that decoded the file, see decode_file.
+        filename (str): the name of the file, without its extension.
+        output_file (typing.TextIO): writes all output to this file.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+        comments (bool): see translate_file.
+
+    Returns:
+        int: the estimated number of cycles it takes to run every comparison
+        in the file once, see translate_file.
+    """
+    code_writer = CodeWriter(
+        output_file, cache_top, shared_calls, shared_comparisons, comments)
+    code_writer.set_file_name(filename)
+    write_commands(code_writer, zip(
+        parser.opcodes, parser.segments, parser.arguments, parser.names))
+    code_writer.spill_top()
+    code_writer.flush()
+    return code_writer.comparison_cycles
+
+
+def translate_path(
+        input_path: str, cache_top: bool = False, shared_calls: bool = False,
+        shared_comparisons: bool = False, comments: bool = True,
+        dead_functions: typing.AbstractSet[str] = frozenset(),
+        fold_constants: bool = False,
+        inliner: typing.Optional[Inliner] = None,
+        alternatives: typing.Sequence[typing.Tuple[bool, bool]] = ()
+) -> typing.List[typing.Tuple[str, int]]:
+    """Translates a single file, without the bootstrap code. The file is
+    decoded once, and written once for every set of options.
+
+    Args:
+        input_path (str): the path of the .vm file.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+        comments (bool): see translate_file.
+        dead_functions (typing.AbstractSet[str]): see translate_file.
+        fold_constants (bool): see translate_file.
+        inliner (typing.Optional[Inliner]): see translate_file.
+        alternatives (typing.Sequence[typing.Tuple[bool, bool]]): other
+            values of shared_calls and shared_comparisons to also translate
+            the file with.
+
+    Returns:
+        typing.List[typing.Tuple[str, int]]: the assembly, and the estimated
+        number of cycles it takes to run every comparison in the file once,
+        and the same for every alternative.
+    """
+    input_filename, input_extension = os.path.splitext(os.path.basename(input_path))
+    translations = []
+    with open(input_path, 'r') as input_file:
+        try:
+            parser = decode_file(
+                input_file, dead_functions, fold_constants, inliner)
+            for file_shared_calls, file_shared_comparisons in (
+                    [(shared_calls, shared_comparisons)] + list(alternatives)):
+                output_file = io.StringIO()
+                comparison_cycles = write_file(
+                    parser, input_filename, output_file, cache_top,
+                    file_shared_calls, file_shared_comparisons, comments)
+                translations.append((output_file.getvalue(), comparison_cycles))
+        except ValueError as error:
+            raise ValueError(input_path + ": " + str(error))
+    return translations
+
+
+def translate_program(
+        input_paths: typing.List[str], output_file: typing.TextIO,
+        peephole: bool = False, cache_top: bool = False,
+        shared_calls: bool = False, shared_comparisons: bool = False,
+        comments: bool = True, jobs: int = 1,
+        call_graph: typing.Optional[CallGraph] = None,
+        fold_constants: bool = False, inliner: typing.Optional[Inliner] = None,
+        alternatives: typing.Sequence[typing.Tuple[bool, bool]] = ()
+) -> typing.Tuple[typing.Optional[PeepholeOptimizer], int,
+                  typing.List[typing.Tuple[int, int]]]:
+    """Translates VM files into one program, that starts with the bootstrap
+    code. Every file is translated on its own, see translate_path, so with
+    more than one job the files are translated in parallel by a pool of
+    processes. The translations are written in the order of input_paths, and
+    the output is the same for any number of jobs.
+    Alternatives are translated in the same pass, only to be measured.
+
+    Args:
+        input_paths (typing.List[str]): the paths of the files to translate.
+        output_file (typing.TextIO): writes all output to this file.
+        peephole (bool): if this is True, the output is optimized by a
+            PeepholeOptimizer.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+        comments (bool): see translate_file.
+        jobs (int): the number of processes to use.
+        call_graph (typing.Optional[CallGraph]): if given, the files are
+            added to it, and the functions that can not be called from
+            entry_function are not translated.
+        fold_constants (bool): see translate_file.
+        inliner (typing.Optional[Inliner]): if given, it plans which calls to
+            inline over the whole program, and they are inlined.
+        alternatives (typing.Sequence[typing.Tuple[bool, bool]]): other
+            values of shared_calls and shared_comparisons to also translate
+            the program with.
+
+    Returns:
+        typing.Tuple[typing.Optional[PeepholeOptimizer], int,
+        typing.List[typing.Tuple[int, int]]]: the optimizer, if peephole is
+        True, the estimated number of cycles it takes to run every comparison
+        once, and the ROM size and the cycles of every alternative.
+    """
+    optimizer = None
+    if peephole is True:
+        optimizer = PeepholeOptimizer(output_file)
+        output_file = optimizer
+    dead_functions = frozenset()
+    drop_unused = call_graph is not None
+    if call_graph is None and inliner is not None:
+        # the inliner plans over the whole program, but nothing is dropped
+        call_graph = CallGraph()
+    if call_graph is not None:
+        for input_path in input_paths:
+            with open(input_path, 'r') as input_file:
+                parser = Parser(input_file)
+                try:
+                    parser.decode()
+                except ValueError as error:
+                    raise ValueError(input_path + ": " + str(error))
+            if fold_constants is True:
+                # calls that are folded away do not keep functions alive
+                ConstantFolder.fold(parser)
+            call_graph.add_file(parser, os.path.splitext(
+                os.path.basename(input_path))[0])
+    if inliner is not None:
+        # functions that are only called where they are inlined are dead
+        inliner.plan(call_graph)
+    if drop_unused is True:
+        dead_functions = frozenset(call_graph.dead_functions(entry_function))
+    # the pool also measures the alternatives, while the program is optimized
+    executor = None
+    if jobs > 1 and (len(input_paths) > 1 or len(alternatives) > 0):
+        executor = concurrent.futures.ProcessPoolExecutor(jobs)
+    with executor or contextlib.nullcontext():
+        if executor is not None:
+            chunk_size = max(1, len(input_paths) // (jobs * 4))
+            translations = list(executor.map(
+                translate_path, input_paths, itertools.repeat(cache_top),
+                itertools.repeat(shared_calls),
+                itertools.repeat(shared_comparisons),
+                itertools.repeat(comments), itertools.repeat(dead_functions),
+                itertools.repeat(fold_constants), itertools.repeat(inliner),
+                itertools.repeat(alternatives), chunksize=chunk_size))
+        else:
+            translations = [
+                translate_path(input_path, cache_top, shared_calls,
+                               shared_comparisons, comments, dead_functions,
+                               fold_constants, inliner, alternatives)
+                for input_path in input_paths]
+        options = [(shared_calls, shared_comparisons)] + list(alternatives)
+        comparison_cycles = [0] * len(options)
+        programs = [[] for option in options]
+        for program, (program_shared_calls, program_shared_comparisons) in (
+                zip(programs, options)):
+            bootstrap = io.StringIO()
+            write_bootstrap(bootstrap, cache_top, program_shared_calls,
+                            program_shared_comparisons, comments)
+            program.append(bootstrap.getvalue())
+        for file_translations in translations:
+            for i, (assembly, file_comparison_cycles) in enumerate(
+                    file_translations):
+                programs[i].append(assembly)
+                comparison_cycles[i] += file_comparison_cycles
+        if executor is not None:
+            alternative_sizes = executor.map(
+                program_size, programs[1:], itertools.repeat(peephole))
+        else:
+            alternative_sizes = (program_size(program, peephole)
+                                 for program in programs[1:])
+        for assembly in programs[0]:
+            output_file.write(assembly)
+        if optimizer is not None:
+            optimizer.flush()
+        return optimizer, comparison_cycles[0], list(
+            zip(alternative_sizes, comparison_cycles[1:]))
+
+
+def program_size(assemblies: typing.List[str], peephole: bool = False) -> int:
+    """
+    Args:
+        assemblies (typing.List[str]): the parts of a program, in order.
+        peephole (bool): if this is True, the program is measured after it
+            is optimized by a PeepholeOptimizer.
+
+    Returns:
+        int: the number of instructions in the program.
+    """
+    program = io.StringIO()
+    output_file = PeepholeOptimizer(program) if peephole is True else program
+    for assembly in assemblies:
+        output_file.write(assembly)
+    if peephole is True:
+        output_file.flush()
+    return rom_size(program.getvalue())
+
+
+def translation_size(
+        commands: typing.Iterable[typing.Tuple[int, int, int, str]],
+        filename: str, cache_top: bool = False, shared_calls: bool = False,
+        shared_comparisons: bool = False) -> int:
+    """
+    Args:
+        commands (typing.Iterable[typing.Tuple[int, int, int, str]]): decoded
+            commands, see Parser.decode.
+        filename (str): the name of the file the commands are in.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+
+    Returns:
+        int: the number of instructions the commands are translated to.
+    """
+    assembly = io.StringIO()
+    code_writer = CodeWriter(
+        assembly, cache_top, shared_calls, shared_comparisons, False)
+    code_writer.set_file_name(filename)
+    write_commands(code_writer, commands)
+    code_writer.spill_top()
+    code_writer.flush()
+    return rom_size(assembly.getvalue())
+
+
+def dead_function_report(
+        call_graph: CallGraph, cache_top: bool = False,
+        shared_calls: bool = False, shared_comparisons: bool = False) -> str:
+    """
+    Args:
+        call_graph (CallGraph): the call graph of a program that was
+            translated by translate_program.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+
+    Returns:
+        str: a line for every function that was dropped, with the number of
+        VM commands and of instructions it has, and a line with the totals.
+    """
+    lines = []
+    total_commands = 0
+    total_size = 0
+    for function in call_graph.dead_functions(entry_function):
+        commands = len(call_graph.commands[function])
+        size = translation_size(
+            call_graph.commands[function], call_graph.files[function],
+            cache_top, shared_calls, shared_comparisons)
+        lines.append("dead functions: dropped %s (%s.vm), %d VM commands, "
+                     "%d instructions" % (function, call_graph.files[function],
+                                          commands, size))
+        total_commands += commands
+        total_size += size
+    lines.append("dead functions: dropped %d of %d functions, %d VM commands, "
+                 "%d instructions" % (len(lines), len(call_graph.commands),
+                                      total_commands, total_size))
+    return "\n".join(lines)
+
+
+def inline_report(
+        inliner: Inliner, cache_top: bool = False, shared_calls: bool = False,
+        shared_comparisons: bool = False) -> str:
+    """Estimates the cycles every inlined call saves, by the instructions
+    that run for the call, the function and its return, and for the
+    commands that replace them. None of them loop, but comparisons branch,
+    so the estimate is close but not exact.
+
+    Args:
+        inliner (Inliner): an inliner that was used by translate_program.
+        cache_top (bool): see translate_file.
+        shared_calls (bool): see translate_file.
+        shared_comparisons (bool): see translate_file.
+
+    Returns:
+        str: a line for every inlined call, and a line with the totals.
+    """
+    routines_size = 0
+    if shared_calls is True:
+        # a call runs all of $$CALL and $$RETURN
+        assembly = io.StringIO()
+        code_writer = CodeWriter(
+            assembly, cache_top, shared_calls, shared_comparisons, False)
+        code_writer.write_shared_routines()
+        code_writer.flush()
+        routines_size = rom_size(assembly.getvalue())
+    lines = []
+    total = 0
+    savings = {}
+    for caller, filename, function, n_args in inliner.sites:
+        kept = inliner.temp_words[caller]
+        key = (function, n_args, filename, kept)
+        if key not in savings:
+            function_commands = (
+                [(FUNCTION, 0,
+                  inliner.local_counts[function], function)]
+                + inliner.bodies[function]
+                + [(RETURN, 0, 0, "")])
+            savings[key] = (
+                translation_size(
+                    [(CALL, 0, n_args, function)], filename,
+                    cache_top, shared_calls, shared_comparisons)
+                + translation_size(function_commands, filename, cache_top,
+                                   shared_calls, shared_comparisons)
+                + routines_size
+                - translation_size(
+                    inliner.expansion(function, n_args, filename, kept),
+                    filename, cache_top, shared_calls, shared_comparisons))
+        lines.append("inline: %s into %s, about %d cycles saved per call"
+                     % (function, caller, savings[key]))
+        total += savings[key]
+    lines.append("inline: inlined %d calls to %d functions, about %d cycles "
+                 "saved if each of them runs once"
+                 % (len(inliner.sites),
+                    len({site[2] for site in inliner.sites}), total))
+    return "\n".join(lines)
+
+
+def rom_size(assembly: str) -> int:
+    """
+    Args:
+        assembly (str): Hack assembly code.
+
+    Returns:
+        int: the number of instructions in the code.
+    """
+    return sum(1 for line in assembly.splitlines()
+               if line.strip() != "" and not line.startswith(("//", "(")))
 
 
 if "__main__" == __name__:
@@ -59,25 +516,108 @@ if "__main__" == __name__:
     # Both are closed automatically when the code finishes running.
     # If the output file does not exist, it is created automatically in the
     # correct path, using the correct filename.
-    if not len(sys.argv) == 2:
-        sys.exit("Invalid usage, please use: VMtranslator <input path>")
-    argument_path = os.path.abspath(sys.argv[1])
+    arg_parser = argparse.ArgumentParser(
+        prog="VMtranslator", description="Translates VM code to Hack assembly.")
+    arg_parser.add_argument("input_path", help="a .vm file or a directory")
+    arg_parser.add_argument(
+        "--peephole", action="store_true",
+        help="remove redundant instructions from the output, and print how "
+             "many were removed")
+    arg_parser.add_argument(
+        "--cache-top", action="store_true",
+        help="keep the top of the stack in the D register between commands")
+    arg_parser.add_argument(
+        "--shared-calls", action="store_true",
+        help="make calls and returns jump to shared routines instead of "
+             "inlining them, and print the ROM size with and without them")
+    arg_parser.add_argument(
+        "--optimize", choices=["speed", "size"],
+        help="compare inline for speed, or with shared routines for size, "
+             "and print the ROM size and the estimated cycles comparisons "
+             "take both ways")
+    arg_parser.add_argument(
+        "--no-comments", action="store_false", dest="comments",
+        help="do not write the VM commands as comments in the output")
+    arg_parser.add_argument(
+        "--drop-unused", action="store_true",
+        help="do not translate the functions Sys.init can never call, and "
+             "print the size of each of them")
+    arg_parser.add_argument(
+        "--fold-constants", action="store_true",
+        help="compute operations on constants while translating, and "
+             "replace multiplying by powers of two with shifts")
+    arg_parser.add_argument(
+        "--inline", type=int, metavar="N",
+        help="inline functions of at most N VM commands that call no other "
+             "function, and print the cycles every inlined call saves")
+    arg_parser.add_argument(
+        "--jobs", type=int, default=1, metavar="N",
+        help="translate N files at a time, 0 for one per CPU (default: 1)")
+    args = arg_parser.parse_args()
+    if args.jobs < 0:
+        arg_parser.error("--jobs must be 0 or more")
+    if args.inline is not None and args.inline < 0:
+        arg_parser.error("--inline must be 0 or more")
+    jobs = args.jobs or os.cpu_count()
+    argument_path = os.path.abspath(args.input_path)
     if os.path.isdir(argument_path):
+        # static variables are placed in the order the files are translated,
+        # which is sorted like in VMInterpreter.load, and the same on every
+        # system
         files_to_translate = [
             os.path.join(argument_path, filename)
-            for filename in os.listdir(argument_path)]
+            for filename in sorted(os.listdir(argument_path))]
         output_path = os.path.join(argument_path, os.path.basename(
             argument_path))
     else:
         files_to_translate = [argument_path]
         output_path, extension = os.path.splitext(argument_path)
     output_path += ".asm"
-    bootstrap = True
+    files_to_translate = [
+        input_path for input_path in files_to_translate
+        if os.path.splitext(input_path)[1].lower() == ".vm"]
+    shared_comparisons = args.optimize == "size"
+    call_graph = CallGraph() if args.drop_unused is True else None
+    inliner = Inliner(args.inline) if args.inline is not None else None
+    # the options the program is compared with, which are translated in the
+    # same pass
+    alternatives = []
+    if args.shared_calls is True:
+        alternatives.append((False, shared_comparisons))
+    if args.optimize is not None:
+        alternatives.append((args.shared_calls, not shared_comparisons))
     with open(output_path, 'w') as output_file:
-        for input_path in files_to_translate:
-            filename, extension = os.path.splitext(input_path)
-            if extension.lower() != ".vm":
-                continue
-            with open(input_path, 'r') as input_file:
-                translate_file(input_file, output_file, bootstrap)
-            bootstrap = False
+        try:
+            optimizer, comparison_cycles, measurements = translate_program(
+                files_to_translate, output_file, args.peephole, args.cache_top,
+                args.shared_calls, shared_comparisons, args.comments, jobs,
+                call_graph, args.fold_constants, inliner, alternatives)
+        except ValueError as error:
+            sys.exit(str(error))
+    if optimizer is not None:
+        print(optimizer.report(), file=sys.stderr)
+    if call_graph is not None:
+        print(dead_function_report(call_graph, args.cache_top,
+                                   args.shared_calls, shared_comparisons),
+              file=sys.stderr)
+    if inliner is not None:
+        print(inline_report(inliner, args.cache_top, args.shared_calls,
+                            shared_comparisons), file=sys.stderr)
+    with open(output_path, 'r') as output_file:
+        size = rom_size(output_file.read())
+    if args.shared_calls is True:
+        shared_size = size
+        inline_size = measurements.pop(0)[0]
+        print("shared calls: ROM size %d instructions, %d with inline calls "
+              "(%.1f%% smaller)" % (shared_size, inline_size,
+                                    100 * (inline_size - shared_size) / inline_size),
+              file=sys.stderr)
+    if args.optimize is not None:
+        other_size, other_comparison_cycles = measurements.pop(0)
+        other_goal = "speed" if args.optimize == "size" else "size"
+        for goal, goal_size, goal_cycles in (
+                (args.optimize, size, comparison_cycles),
+                (other_goal, other_size, other_comparison_cycles)):
+            print("optimized for %s: ROM size %d instructions, running every "
+                  "comparison once takes about %d cycles"
+                  % (goal, goal_size, goal_cycles), file=sys.stderr)
@@ -0,0 +1,37 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class OutputBuffer:
+    """Collects the text CodeWriter writes, and writes it to an output stream
+    in one block when it is flushed.
+
+    CodeWriter writes a line at a time, and writing to a file for every line
+    is much slower than appending to a list, so write is the append method
+    of the list that collects the text.
+    """
+
+    def __init__(self, output_stream: typing.TextIO) -> None:
+        """Creates a buffer that writes to the given stream.
+
+        Args:
+            output_stream (typing.TextIO): output stream.
+        """
+        self.os = output_stream
+        self.chunks = []
+        self.write = self.chunks.append
+
+    def flush(self) -> None:
+        """Writes the text that was collected since the last flush to the
+        output stream.
+        """
+        if len(self.chunks) > 0:
+            self.os.write("".join(self.chunks))
+            # write is bound to the list, so it must be emptied in place
+            self.chunks.clear()
@@ -6,6 +6,10 @@ as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
 Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
 """
 import typing
+from array import array
+
+# the types of decoded commands, see Parser.decode
+(ARITHMETIC, PUSH, POP, LABEL, GOTO, IF, FUNCTION, RETURN, CALL) = range(9)
 
 
 class Parser:
@@ -46,6 +50,21 @@ class Parser:
       - return
     """
 
+    # decoded commands refer to these by their index
+    command_types = ("C_ARITHMETIC", "C_PUSH", "C_POP", "C_LABEL", "C_GOTO",
+                     "C_IF", "C_FUNCTION", "C_RETURN", "C_CALL")
+    arithmetic_commands = ("add", "sub", "neg", "eq", "gt", "lt", "and", "or",
+                           "not", "shiftleft", "shiftright")
+    segment_names = ("constant", "local", "argument", "this", "that",
+                     "pointer", "temp", "static")
+    keywords = {"push": PUSH, "pop": POP, "label": LABEL, "goto": GOTO,
+                "if-goto": IF, "function": FUNCTION, "return": RETURN,
+                "call": CALL}
+    arithmetic_ids = {command: command_id
+                      for command_id, command in enumerate(arithmetic_commands)}
+    segment_ids = {segment: segment_id
+                   for segment_id, segment in enumerate(segment_names)}
+
     def __init__(self, input_file: typing.TextIO) -> None:
         """Gets ready to parse the input file.
 
@@ -60,6 +79,101 @@ class Parser:
         # self.current_instruction_num = -1
         self.arithmetic_set = {"add", "sub", "neg", "and", "or", "not", "shiftleft", "shiftright",
                                "eq", "gt", "lt"}
+        # the decoded commands, filled by decode
+        self.opcodes = array("B")
+        self.segments = array("B")
+        self.arguments = array("l")
+        self.names = []
+
+    def decode(self) -> None:
+        """Tokenizes every command of the input once, instead of classifying
+        the current command again whenever it is accessed.
+
+        The command i is decoded into:
+        - opcodes[i]: its type, ARITHMETIC, PUSH, POP, LABEL, GOTO, IF,
+          FUNCTION, RETURN or CALL, which is the index of its string in
+          Parser.command_types.
+        - segments[i]: the index of the segment of push and pop in
+          Parser.segment_names, or of an arithmetic command in
+          Parser.arithmetic_commands.
+        - arguments[i]: the index of push and pop, or the number of arguments
+          or local variables of call and function.
+        - names[i]: the label of label, goto and if-goto, or the function of
+          function and call.
+        Fields that a command does not have are 0 or "".
+        """
+        opcodes, segments, arguments, names = (
+            self.opcodes, self.segments, self.arguments, self.names)
+        keywords = Parser.keywords
+        arithmetic_ids = Parser.arithmetic_ids
+        segment_ids = Parser.segment_ids
+        for line_num, line in enumerate(self.input_lines_array, 1):
+            words = line.split("//", 1)[0].split()
+            if len(words) == 0:
+                continue
+            opcode = keywords.get(words[0])
+            segment = 0
+            argument = 0
+            name = ""
+            try:
+                if opcode is None:
+                    opcode = ARITHMETIC
+                    segment = arithmetic_ids[words[0]]
+                elif opcode == PUSH or opcode == POP:
+                    segment = segment_ids[words[1]]
+                    argument = int(words[2])
+                elif opcode == FUNCTION or opcode == CALL:
+                    name = words[1]
+                    argument = int(words[2])
+                elif opcode != RETURN:
+                    name = words[1]
+            except (KeyError, IndexError, ValueError):
+                raise ValueError("line %d: invalid command %s"
+                                 % (line_num, line.strip()))
+            opcodes.append(opcode)
+            segments.append(segment)
+            arguments.append(argument)
+            names.append(name)
+
+    def remove_functions(self, functions: typing.AbstractSet[str]) -> None:
+        """Removes the decoded commands of the given functions. A function's
+        commands are those from its function command to the next one.
+
+        Args:
+            functions (typing.AbstractSet[str]): the functions to remove.
+        """
+        kept = []
+        keep = True
+        for i, (opcode, name) in enumerate(zip(self.opcodes, self.names)):
+            if opcode == FUNCTION:
+                keep = name not in functions
+            if keep is True:
+                kept.append(i)
+        if len(kept) < len(self.opcodes):
+            self.opcodes = array("B", [self.opcodes[i] for i in kept])
+            self.segments = array("B", [self.segments[i] for i in kept])
+            self.arguments = array("l", [self.arguments[i] for i in kept])
+            self.names = [self.names[i] for i in kept]
+
+    def replace_commands(
+            self, commands: typing.Iterable[typing.Tuple[int, int, int, str]]
+    ) -> None:
+        """Replaces the decoded commands.
+
+        Args:
+            commands (typing.Iterable[typing.Tuple[int, int, int, str]]): the
+                opcode, segment, argument and name of every new command, see
+                decode.
+        """
+        self.opcodes = array("B")
+        self.segments = array("B")
+        self.arguments = array("l")
+        self.names = []
+        for opcode, segment, argument, name in commands:
+            self.opcodes.append(opcode)
+            self.segments.append(segment)
+            self.arguments.append(argument)
+            self.names.append(name)
 
     def has_more_commands(self) -> bool:
         """Are there more commands in the input?
@@ -0,0 +1,219 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import typing
+
+
+class PeepholeOptimizer:
+    """Removes redundant instructions from the assembly CodeWriter writes.
+
+    The optimizer stands in for the output stream of a CodeWriter. It keeps
+    the assembly it is given until flush is called, and then writes it to the
+    real output stream with these instructions removed:
+    - windows of instructions that CodeWriter emits for consecutive VM
+      commands and that cancel out, like an SP++ followed by an SP--.
+    - "@X" when A already holds X.
+    - loads into D or A whose value is overwritten before it is used.
+
+    Labels and jumps end every window, since control can reach the
+    instruction after them from elsewhere. Comments are kept.
+    """
+
+    # windows of consecutive instructions, mapped to the instructions that
+    # replace them. Some of them drop a store to the word just above the
+    # top of the stack, which is dead: CodeWriter only moves SP up right
+    # after storing a new value there
+    windows = {
+        # SP++ and then SP--
+        ("@SP", "M=M+1", "@SP", "M=M-1"): ("@SP",),
+        # A is still *SP, since storing to *SP can not change SP
+        ("@SP", "A=M", "M=D", "@SP", "A=M"): ("@SP", "A=M", "M=D"),
+        # a value that is pushed and then popped into D by a binary operation
+        ("@SP", "A=M", "M=D", "@SP", "A=M-1"): ("@SP", "A=M-1"),
+        ("M=D", "D=M"): ("M=D",),
+    }
+
+    def __init__(self, output_stream: typing.TextIO) -> None:
+        """Creates an optimizer that writes to the given stream.
+
+        Args:
+            output_stream (typing.TextIO): output stream.
+        """
+        self.os = output_stream
+        self.lines = []
+        # the number of instructions that were written, and of those that
+        # were removed, over all the flushes
+        self.instructions = 0
+        self.removed = 0
+
+    def write(self, text: str) -> None:
+        """Takes assembly from a CodeWriter.
+
+        Args:
+            text (str): one or more lines of assembly.
+        """
+        self.lines.extend(text.splitlines())
+
+    def flush(self) -> None:
+        """Optimizes the assembly that was written since the last flush, and
+        writes it to the output stream.
+        """
+        lines = self.lines
+        instructions = sum(1 for line in lines if PeepholeOptimizer.is_instruction(line))
+        changed = True
+        while changed:
+            changed = PeepholeOptimizer.replace_windows(lines)
+            changed |= PeepholeOptimizer.remove_reloads(lines)
+            changed |= PeepholeOptimizer.remove_dead_loads(lines)
+            if changed:
+                lines[:] = [line for line in lines if line is not None]
+        self.instructions += instructions
+        self.removed += instructions - sum(
+            1 for line in lines if PeepholeOptimizer.is_instruction(line))
+        if lines:
+            self.os.write("\n".join(lines) + "\n")
+        self.lines = []
+
+    def report(self) -> str:
+        """
+        Returns:
+            str: how many instructions were removed.
+        """
+        percent = 100 * self.removed / self.instructions if self.instructions else 0
+        return "peephole: removed %d of %d instructions (%.1f%%)" % (
+            self.removed, self.instructions, percent)
+
+    @staticmethod
+    def is_instruction(line: typing.Optional[str]) -> bool:
+        """
+        Args:
+            line (typing.Optional[str]): a line of assembly, or None if it
+                was removed.
+
+        Returns:
+            bool: True if the line is an A- or C-instruction.
+        """
+        return line is not None and line != "" and not line.startswith(("//", "("))
+
+    @staticmethod
+    def split(instruction: str) -> typing.Tuple[str, str, str]:
+        """
+        Args:
+            instruction (str): a C-instruction.
+
+        Returns:
+            typing.Tuple[str, str, str]: its dest, comp and jump, where a
+            missing dest or jump is "".
+        """
+        dest, _, rest = instruction.rpartition("=")
+        comp, _, jump = rest.partition(";")
+        return dest, comp, jump
+
+    @staticmethod
+    def replace_windows(lines: typing.List[typing.Optional[str]]) -> bool:
+        """Replaces the windows of instructions in PeepholeOptimizer.windows.
+        Removed lines are set to None.
+
+        Args:
+            lines (typing.List[typing.Optional[str]]): the assembly.
+
+        Returns:
+            bool: True if any window was replaced.
+        """
+        # the indices of the instructions and labels, comments are skipped
+        positions = [i for i, line in enumerate(lines)
+                     if line is not None and line != "" and not line.startswith("//")]
+        sizes = sorted({len(window) for window in PeepholeOptimizer.windows})
+        changed = False
+        i = 0
+        while i < len(positions):
+            for size in sizes:
+                window = tuple(lines[position] for position in positions[i:i + size])
+                replacement = PeepholeOptimizer.windows.get(window)
+                if replacement is not None:
+                    for position, line in zip(positions[i:i + size],
+                                              replacement + (None,) * size):
+                        lines[position] = line
+                    del positions[i + len(replacement):i + size]
+                    changed = True
+                    # the replacement may start a window with what is before it
+                    i = max(i - max(sizes), -1)
+                    break
+            i += 1
+        return changed
+
+    @staticmethod
+    def remove_reloads(lines: typing.List[typing.Optional[str]]) -> bool:
+        """Removes "@X" instructions when A already holds X.
+
+        Args:
+            lines (typing.List[typing.Optional[str]]): the assembly.
+
+        Returns:
+            bool: True if any instruction was removed.
+        """
+        changed = False
+        # the symbol or constant A holds, if it is known
+        register_a = None
+        for i, line in enumerate(lines):
+            if not PeepholeOptimizer.is_instruction(line):
+                if line is not None and line.startswith("("):
+                    register_a = None
+                continue
+            if line.startswith("@"):
+                if line == register_a:
+                    lines[i] = None
+                    changed = True
+                register_a = line
+            elif "A" in PeepholeOptimizer.split(line)[0]:
+                register_a = None
+        return changed
+
+    @staticmethod
+    def remove_dead_loads(lines: typing.List[typing.Optional[str]]) -> bool:
+        """Removes instructions that only set D or only set A, when the
+        register is set again before anything reads it.
+
+        Args:
+            lines (typing.List[typing.Optional[str]]): the assembly.
+
+        Returns:
+            bool: True if any instruction was removed.
+        """
+        changed = False
+        for i, line in enumerate(lines):
+            if not PeepholeOptimizer.is_instruction(line) or line.startswith("@"):
+                continue
+            dest, comp, jump = PeepholeOptimizer.split(line)
+            if jump or dest not in ("D", "A"):
+                continue
+            for j in range(i + 1, len(lines)):
+                following = lines[j]
+                if following is None or following.startswith("//"):
+                    continue
+                if not PeepholeOptimizer.is_instruction(following):
+                    # a label, control may come here from elsewhere
+                    break
+                if following.startswith("@"):
+                    if dest == "A":
+                        lines[i] = None
+                        changed = True
+                        break
+                    continue
+                next_dest, next_comp, next_jump = PeepholeOptimizer.split(following)
+                if dest == "D":
+                    reads = "D" in next_comp
+                else:
+                    # M is addressed by A, and so is the target of a jump
+                    reads = "A" in next_comp or "M" in next_comp or "M" in next_dest
+                if reads or next_jump:
+                    break
+                if dest in next_dest:
+                    lines[i] = None
+                    changed = True
+                    break
+        return changed
@@ -0,0 +1,446 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import argparse
+import os
+import sys
+import typing
+from array import array
+from Parser import Parser
+
+# opcodes, numbered in about the order the interpreter tests for them
+(PUSH_CONSTANT, PUSH_LOCAL, PUSH_ARGUMENT, POP_LOCAL, ADD, IF_GOTO, GOTO,
+ PUSH_THIS, PUSH_THAT, POP_THIS, POP_THAT, PUSH_STATIC, POP_STATIC, PUSH_TEMP,
+ POP_TEMP, POP_ARGUMENT, SUB, LT, GT, EQ, NOT, NEG, AND, OR, CALL, FUNCTION,
+ RETURN, PUSH_POINTER_THIS, PUSH_POINTER_THAT, POP_POINTER_THIS,
+ POP_POINTER_THAT, SHIFT_LEFT, SHIFT_RIGHT) = range(33)
+
+
+class VMInterpreter:
+    """Runs VM programs directly, without translating them to assembly.
+
+    The commands of all the files are decoded once into parallel arrays of
+    opcodes and integer arguments: segments are folded into the opcodes,
+    static variables and temp entries become RAM addresses, and labels and
+    functions become indices into the arrays. RAM is laid out like on the
+    Hack computer, with the stack, frames and segments at the same addresses
+    the translated program would use. SP, LCL, ARG, THIS and THAT are kept in
+    local variables while running and are written back to RAM[0..4] when run
+    returns.
+    """
+
+    # the last RAM address, and the words the static segment can use
+    ram_size = 1 << 15
+    static_start = 16
+    static_end = 256
+
+    # push and pop commands, by segment
+    push_opcodes = {"constant": PUSH_CONSTANT, "local": PUSH_LOCAL,
+                    "argument": PUSH_ARGUMENT, "this": PUSH_THIS,
+                    "that": PUSH_THAT, "static": PUSH_STATIC, "temp": PUSH_TEMP}
+    pop_opcodes = {"local": POP_LOCAL, "argument": POP_ARGUMENT,
+                   "this": POP_THIS, "that": POP_THAT, "static": POP_STATIC,
+                   "temp": POP_TEMP}
+    pointer_opcodes = {("push", 0): PUSH_POINTER_THIS,
+                       ("push", 1): PUSH_POINTER_THAT,
+                       ("pop", 0): POP_POINTER_THIS,
+                       ("pop", 1): POP_POINTER_THAT}
+    arithmetic_opcodes = {"add": ADD, "sub": SUB, "neg": NEG, "eq": EQ,
+                          "gt": GT, "lt": LT, "and": AND, "or": OR, "not": NOT,
+                          "shiftleft": SHIFT_LEFT, "shiftright": SHIFT_RIGHT}
+
+    # reasons for run to return, like Emulator.run
+    HALTED = "HALTED"
+    CYCLE_LIMIT = "CYCLE_LIMIT"
+
+    def __init__(self) -> None:
+        """Creates an interpreter with no program. Add the files of the
+        program with add_file, and then call link.
+        """
+        self.opcodes = array("B")
+        self.arguments = array("l")
+        # the number of arguments of call and of local variables of function
+        self.counts = array("l")
+        self.ram = array("h", bytes(2 * VMInterpreter.ram_size))
+        # function names and "function$label" names, mapped to the index of
+        # the command they point to
+        self.functions = dict()
+        self.labels = dict()
+        # indices of goto, if-goto and call commands, mapped to the name of
+        # their target until link resolves them
+        self.fixups = dict()
+        self.statics = dict()
+        self.pc = 0
+        self.cycles = 0
+
+    @staticmethod
+    def load(path: str) -> "VMInterpreter":
+        """Loads a program from a .vm file, or from all the .vm files in a
+        directory.
+
+        Args:
+            path (str): the path of the file or directory.
+
+        Returns:
+            VMInterpreter: an interpreter that is ready to run the program.
+        """
+        interpreter = VMInterpreter()
+        if os.path.isdir(path):
+            input_paths = [os.path.join(path, filename)
+                           for filename in sorted(os.listdir(path))]
+        else:
+            input_paths = [path]
+        for input_path in input_paths:
+            if os.path.splitext(input_path)[1].lower() != ".vm":
+                continue
+            with open(input_path, 'r') as input_file:
+                interpreter.add_file(input_file)
+        interpreter.link()
+        return interpreter
+
+    def add_file(self, input_file: typing.TextIO) -> None:
+        """Decodes the commands of a .vm file and appends them to the
+        program. The file is tokenized by Parser.decode, like the translator
+        does.
+
+        Args:
+            input_file (typing.TextIO): the file to add.
+        """
+        filename = os.path.splitext(os.path.basename(input_file.name))[0]
+        parser = Parser(input_file)
+        try:
+            parser.decode()
+        except ValueError as error:
+            raise ValueError("%s: %s" % (filename, error))
+        opcodes, arguments, counts = self.opcodes, self.arguments, self.counts
+        function_name = ""
+        for parser_opcode, segment, argument, name in zip(
+                parser.opcodes, parser.segments, parser.arguments,
+                parser.names):
+            command_type = Parser.command_types[parser_opcode]
+            count = 0
+            if command_type == "C_ARITHMETIC":
+                opcode = VMInterpreter.arithmetic_opcodes[
+                    Parser.arithmetic_commands[segment]]
+            elif command_type == "C_PUSH" or command_type == "C_POP":
+                segment = Parser.segment_names[segment]
+                command = "push" if command_type == "C_PUSH" else "pop"
+                try:
+                    if segment == "pointer":
+                        opcode = VMInterpreter.pointer_opcodes[(command, argument)]
+                    elif command == "push":
+                        opcode = VMInterpreter.push_opcodes[segment]
+                    else:
+                        opcode = VMInterpreter.pop_opcodes[segment]
+                except KeyError:
+                    raise ValueError("%s: invalid command %s %s %d"
+                                     % (filename, command, segment, argument))
+                if segment == "temp":
+                    argument += 5
+                elif segment == "static":
+                    argument = self.static_address(filename + "." + str(argument))
+            elif command_type == "C_LABEL":
+                # labels are not commands, they name the command after them
+                self.labels[function_name + "$" + name] = len(opcodes)
+                continue
+            elif command_type == "C_GOTO" or command_type == "C_IF":
+                opcode = GOTO if command_type == "C_GOTO" else IF_GOTO
+                self.fixups[len(opcodes)] = function_name + "$" + name
+                argument = 0
+            elif command_type == "C_FUNCTION":
+                opcode = FUNCTION
+                function_name = name
+                self.functions[function_name] = len(opcodes)
+                count = argument
+                argument = 0
+            elif command_type == "C_CALL":
+                opcode = CALL
+                self.fixups[len(opcodes)] = name
+                count = argument
+                argument = 0
+            else:
+                opcode = RETURN
+            opcodes.append(opcode)
+            arguments.append(argument)
+            counts.append(count)
+
+    def static_address(self, symbol: str) -> int:
+        """Allocates static variables from address 16 in order of first
+        appearance, like the assembler does for the translated program.
+
+        Args:
+            symbol (str): the name of the variable, "Xxx.i".
+
+        Returns:
+            int: the RAM address of the variable.
+        """
+        address = self.statics.get(symbol)
+        if address is None:
+            address = VMInterpreter.static_start + len(self.statics)
+            if address >= VMInterpreter.static_end:
+                raise ValueError("too many static variables")
+            self.statics[symbol] = address
+        return address
+
+    def link(self) -> None:
+        """Resolves the targets of goto, if-goto and call commands, and
+        resets the machine.
+        """
+        # return addresses are kept on the stack, so they have to fit in a
+        # word, and one more is needed for returning from Sys.init
+        if len(self.opcodes) >= 1 << 15:
+            raise ValueError("program has %d commands, at most %d can be run"
+                             % (len(self.opcodes), (1 << 15) - 1))
+        for index, name in self.fixups.items():
+            if self.opcodes[index] == CALL:
+                target = self.functions.get(name)
+            else:
+                target = self.labels.get(name)
+            if target is None:
+                raise ValueError("command %d: undefined %s %s" % (
+                    index, "function" if self.opcodes[index] == CALL else "label",
+                    name))
+            self.arguments[index] = target
+        self.fixups.clear()
+        self.reset()
+
+    def reset(self) -> None:
+        """Starts the program again, like bootstrap_func of CodeWriter: SP is
+        set to 256 and Sys.init is called. Returning from Sys.init halts.
+        Programs without Sys.init start from their first command, with the
+        registers already in RAM[0..4].
+        """
+        ram = self.ram
+        self.cycles = 0
+        entry = self.functions.get("Sys.init")
+        if entry is None:
+            self.pc = 0
+            if ram[0] == 0:
+                ram[0] = 256
+            return
+        sp = 256
+        # the frame of "call Sys.init 0", returning past the last command
+        ram[sp] = len(self.opcodes)
+        ram[sp + 1:sp + 5] = ram[1:5]
+        sp += 5
+        ram[0] = sp
+        ram[1] = sp
+        ram[2] = sp - 5
+        self.pc = entry
+
+    def peek(self, address: int) -> int:
+        """Reads a word of RAM.
+
+        Args:
+            address (int): the address to read.
+
+        Returns:
+            int: the word.
+        """
+        return self.ram[address]
+
+    def poke(self, address: int, value: int) -> None:
+        """Writes a word of RAM.
+
+        Args:
+            address (int): the address to write.
+            value (int): the word, either signed or unsigned.
+        """
+        self.ram[address] = ((value + 0x8000) & 0xFFFF) - 0x8000
+
+    def run(self, cycles: typing.Optional[int] = None) -> str:
+        """Runs the program until it stops. A program stops when it returns
+        from Sys.init, runs past its last command, or is stuck in a "goto"
+        to itself.
+
+        Args:
+            cycles (typing.Optional[int]): the most commands to run, or None
+                to run until the program halts.
+
+        Returns:
+            str: why the program stopped, VMInterpreter.HALTED or
+            CYCLE_LIMIT. The state is kept, so run can be called again to
+            continue.
+        """
+        limit = sys.maxsize if cycles is None else cycles
+        opcodes, arguments, counts, ram = (
+            self.opcodes, self.arguments, self.counts, self.ram)
+        sp, lcl, arg, this, that = ram[0:5]
+        pc = self.pc
+        executed = 0
+        reason = VMInterpreter.CYCLE_LIMIT
+        try:
+            for executed in range(limit):
+                opcode = opcodes[pc]
+                x = arguments[pc]
+                pc += 1
+                if opcode == PUSH_CONSTANT:
+                    ram[sp] = x
+                    sp += 1
+                elif opcode == PUSH_LOCAL:
+                    ram[sp] = ram[lcl + x]
+                    sp += 1
+                elif opcode == PUSH_ARGUMENT:
+                    ram[sp] = ram[arg + x]
+                    sp += 1
+                elif opcode == POP_LOCAL:
+                    sp -= 1
+                    ram[lcl + x] = ram[sp]
+                elif opcode == ADD:
+                    sp -= 1
+                    value = ram[sp - 1] + ram[sp]
+                    if value > 32767:
+                        value -= 65536
+                    elif value < -32768:
+                        value += 65536
+                    ram[sp - 1] = value
+                elif opcode == IF_GOTO:
+                    sp -= 1
+                    if ram[sp]:
+                        pc = x
+                elif opcode == GOTO:
+                    if x == pc - 1:
+                        executed += 1
+                        pc = x
+                        reason = VMInterpreter.HALTED
+                        break
+                    pc = x
+                elif opcode == PUSH_THIS:
+                    ram[sp] = ram[this + x]
+                    sp += 1
+                elif opcode == PUSH_THAT:
+                    ram[sp] = ram[that + x]
+                    sp += 1
+                elif opcode == POP_THIS:
+                    sp -= 1
+                    ram[this + x] = ram[sp]
+                elif opcode == POP_THAT:
+                    sp -= 1
+                    ram[that + x] = ram[sp]
+                elif opcode == PUSH_STATIC or opcode == PUSH_TEMP:
+                    ram[sp] = ram[x]
+                    sp += 1
+                elif opcode == POP_STATIC or opcode == POP_TEMP:
+                    sp -= 1
+                    ram[x] = ram[sp]
+                elif opcode == POP_ARGUMENT:
+                    sp -= 1
+                    ram[arg + x] = ram[sp]
+                elif opcode == SUB:
+                    sp -= 1
+                    value = ram[sp - 1] - ram[sp]
+                    if value > 32767:
+                        value -= 65536
+                    elif value < -32768:
+                        value += 65536
+                    ram[sp - 1] = value
+                elif opcode == LT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+                elif opcode == GT:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+                elif opcode == EQ:
+                    sp -= 1
+                    ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+                elif opcode == NOT:
+                    ram[sp - 1] = ~ram[sp - 1]
+                elif opcode == NEG:
+                    value = ram[sp - 1]
+                    ram[sp - 1] = -value if value != -32768 else value
+                elif opcode == AND:
+                    sp -= 1
+                    ram[sp - 1] &= ram[sp]
+                elif opcode == OR:
+                    sp -= 1
+                    ram[sp - 1] |= ram[sp]
+                elif opcode == CALL:
+                    ram[sp] = pc
+                    ram[sp + 1] = lcl
+                    ram[sp + 2] = arg
+                    ram[sp + 3] = this
+                    ram[sp + 4] = that
+                    sp += 5
+                    arg = sp - 5 - counts[pc - 1]
+                    lcl = sp
+                    pc = x
+                elif opcode == FUNCTION:
+                    for _ in range(counts[pc - 1]):
+                        ram[sp] = 0
+                        sp += 1
+                elif opcode == RETURN:
+                    frame = lcl
+                    pc = ram[frame - 5]
+                    ram[arg] = ram[sp - 1]
+                    sp = arg + 1
+                    that = ram[frame - 1]
+                    this = ram[frame - 2]
+                    arg = ram[frame - 3]
+                    lcl = ram[frame - 4]
+                elif opcode == PUSH_POINTER_THIS:
+                    ram[sp] = this
+                    sp += 1
+                elif opcode == PUSH_POINTER_THAT:
+                    ram[sp] = that
+                    sp += 1
+                elif opcode == POP_POINTER_THIS:
+                    sp -= 1
+                    this = ram[sp]
+                elif opcode == POP_POINTER_THAT:
+                    sp -= 1
+                    that = ram[sp]
+                elif opcode == SHIFT_LEFT:
+                    value = ram[sp - 1] << 1
+                    ram[sp - 1] = value - 65536 if value > 32767 else (
+                        value + 65536 if value < -32768 else value)
+                elif opcode == SHIFT_RIGHT:
+                    ram[sp - 1] >>= 1
+            else:
+                executed = limit
+        except IndexError:
+            if pc != len(opcodes):
+                ram[0:5] = array("h", (sp, lcl, arg, this, that))
+                self.pc = pc - 1
+                self.cycles += executed
+                raise ValueError("command %d: RAM address is out of range"
+                                 % (pc - 1)) from None
+            # returned from Sys.init, or ran past the last command
+            reason = VMInterpreter.HALTED
+        ram[0:5] = array("h", (sp, lcl, arg, this, that))
+        self.pc = pc
+        self.cycles += executed
+        return reason
+
+
+if "__main__" == __name__:
+    # Runs a program and prints the requested RAM words when it stops
+    arg_parser = argparse.ArgumentParser(
+        prog="VMInterpreter", description="Runs a VM program.")
+    arg_parser.add_argument(
+        "input_path", help="a .vm file or a directory of .vm files")
+    arg_parser.add_argument(
+        "--cycles", type=int,
+        help="stop after this many commands (default: run until halted)")
+    arg_parser.add_argument(
+        "--set", nargs="+", default=[], metavar="ADDRESS=VALUE",
+        help="write these RAM words before running")
+    arg_parser.add_argument(
+        "--dump", nargs="+", default=[], metavar="START[:END]",
+        help="print these RAM words after running")
+    args = arg_parser.parse_args()
+
+    interpreter = VMInterpreter.load(os.path.abspath(args.input_path))
+    for assignment in args.set:
+        address, value = assignment.split("=")
+        interpreter.poke(int(address), int(value))
+    interpreter.reset()
+    stop_reason = interpreter.run(args.cycles)
+    print("%s after %d commands" % (stop_reason, interpreter.cycles))
+    for memory_range in args.dump:
+        start, _, end = memory_range.partition(":")
+        for ram_address in range(int(start), int(end or start) + 1):
+            print("RAM[%d] = %d" % (ram_address, interpreter.peek(ram_address)))
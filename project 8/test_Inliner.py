@@ -0,0 +1,76 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import io
+import unittest
+from CallGraph import CallGraph
+from Inliner import Inliner, TEMP
+from Parser import Parser, POP, CALL
+
+# a function that takes 1 argument and has 1 local variable
+HELPER = [
+    "function Help.get 1",
+    "push argument 0",
+    "pop local 0",
+    "push local 0",
+    "return",
+]
+
+
+class InlinerTest(unittest.TestCase):
+    """Inlines calls in small VM programs."""
+
+    def inline(self, lines: list) -> Parser:
+        """Plans and inlines the calls of a single file.
+
+        Args:
+            lines (list): the VM commands of the file.
+
+        Returns:
+            Parser: a parser holding the commands after inlining.
+        """
+        call_graph = CallGraph()
+        inliner = Inliner(8)
+        parser = Parser(io.StringIO("\n".join(lines)))
+        parser.decode()
+        call_graph.add_file(parser, "Main")
+        inliner.plan(call_graph)
+        inliner.inline(parser, "Main")
+        return parser
+
+    def test_caller_temp_is_kept(self) -> None:
+        # the caller keeps a value in temp 7 across the call, which the
+        # inlined argument and local variable must not take
+        parser = self.inline([
+            "function Main.main 0",
+            "push constant 9",
+            "pop temp 7",
+            "push constant 2",
+            "call Help.get 1",
+            "pop temp 0",
+            "push temp 7",
+            "return",
+        ] + HELPER)
+        commands = list(zip(parser.opcodes, parser.segments, parser.arguments))
+        self.assertEqual(1, parser.names.count("Help.get"))
+        self.assertNotIn(CALL, parser.opcodes)
+        self.assertEqual(1, commands.count((POP, TEMP, 7)))
+
+    def test_no_free_temp(self) -> None:
+        # the caller uses every temp word, so the call is kept
+        parser = self.inline([
+            "function Main.main 0",
+        ] + ["push constant 0\npop temp %d" % word for word in range(8)] + [
+            "push constant 2",
+            "call Help.get 1",
+            "return",
+        ] + HELPER)
+        self.assertIn(CALL, parser.opcodes)
+
+
+if "__main__" == __name__:
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+This file is part of nand2tetris, as taught in The Hebrew University, and
+was written by Aviv Yaish. It is an extension to the specifications given
+[here](https://www.nand2tetris.org) (Shimon Schocken and Noam Nisan, 2017),
+as allowed by the Creative Common Attribution-NonCommercial-ShareAlike 3.0
+Unported [License](https://creativecommons.org/licenses/by-nc-sa/3.0/).
+"""
+import os
+import tempfile
+import unittest
+from VMInterpreter import VMInterpreter
+
+
+class VMInterpreterTest(unittest.TestCase):
+    """Runs small VM programs on the interpreter."""
+
+    def run_program(self, files: dict) -> VMInterpreter:
+        """Writes .vm files to a new directory, and runs them until they halt.
+
+        Args:
+            files (dict): the text of every file, by file name.
+
+        Returns:
+            VMInterpreter: the interpreter, after the program halted.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            for filename, text in files.items():
+                with open(os.path.join(directory, filename), 'w') as output_file:
+                    output_file.write(text)
+            interpreter = VMInterpreter.load(directory)
+        self.assertEqual(VMInterpreter.HALTED, interpreter.run(10000))
+        return interpreter
+
+    def test_names_with_keywords(self) -> None:
+        # the names contain "return", "push" and "pop", which must not be
+        # read as the commands
+        interpreter = self.run_program({"Sys.vm": "\n".join([
+            "function Sys.init 0",
+            "push constant 3",
+            "call Main.returnSeven 1",
+            "pop static 0",
+            "push constant 1",
+            "push constant 2",
+            "call Stack.push 2",
+            "pop static 1",
+            "label popLoop",
+            "goto popLoop",
+            "function Main.returnSeven 0",
+            "push constant 7",
+            "return",
+            "function Stack.push 0",
+            "push argument 0",
+            "push argument 1",
+            "add",
+            "return",
+        ])})
+        self.assertEqual(7, interpreter.peek(16))
+        self.assertEqual(3, interpreter.peek(17))
+
+
+if "__main__" == __name__:
+    unittest.main()